@@ -0,0 +1,144 @@
+"""Resolution of the `x-key` header to the Gluey account it belongs to, cached in-process.
+
+The lookup itself is pluggable: `configure_key_resolver` takes any `KeyResolver`. Without one, keys are read from the JSON
+file in API_KEYS_FILE (`{"<key>": {"account_number": "..."}}`), or, when that is not set either, every key is accepted as
+the documentation server always has.
+"""
+import asyncio
+from collections import OrderedDict
+import json
+import os
+import time
+from typing import Optional, Protocol
+
+from pydantic import BaseModel, Field
+
+from app.metrics import record_cache_result
+
+class ApiKeyAccount(BaseModel):
+    account_number: Optional[str] = Field(None, description="The Gluey account the API key was issued to.")
+    name: Optional[str] = Field(None, description="A name for the API key, e.g. 'Warehouse integration'.")
+
+class KeyResolver(Protocol):
+    async def resolve(self, key: str) -> ApiKeyAccount | None:
+        """The account of the key, or None when the key is not valid."""
+
+class AnyKeyResolver:
+    """Accepts every key, for the documentation server and local development."""
+
+    async def resolve(self, key: str) -> ApiKeyAccount | None:
+        return ApiKeyAccount()
+
+class StaticKeyResolver:
+    def __init__(self, accounts: dict[str, ApiKeyAccount]):
+        self.accounts = accounts
+
+    @classmethod
+    def from_file(cls, path: str) -> "StaticKeyResolver":
+        with open(path, encoding="utf-8") as keys_file:
+            return cls({key: ApiKeyAccount(**account) for key, account in json.load(keys_file).items()})
+
+    async def resolve(self, key: str) -> ApiKeyAccount | None:
+        return self.accounts.get(key)
+
+# Result of an in-flight lookup whose caller was cancelled before the resolver answered
+leader_cancelled = object()
+
+class CachedKeyResolver:
+    """An LRU cache with a TTL in front of a KeyResolver.
+
+    Invalid keys are cached for a shorter time, so a client retrying with a bad key does not reach the resolver on every
+    request. Concurrent lookups of the same uncached key share one call to the resolver.
+    """
+
+    def __init__(self, resolver: KeyResolver, max_size: int = 10_000, ttl: float = 300.0, negative_ttl: float = 30.0):
+        self.resolver = resolver
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[float, ApiKeyAccount | None]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    def _cached(self, key: str) -> tuple[bool, ApiKeyAccount | None]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, account = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, account
+
+    def _store(self, key: str, account: ApiKeyAccount | None):
+        ttl = self.ttl if account is not None else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, account)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def resolve(self, key: str) -> ApiKeyAccount | None:
+        while True:
+            found, account = self._cached(key)
+            if found:
+                record_cache_result("api_keys", "hit" if account is not None else "negative_hit")
+                return account
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                return await self._lead(key)
+
+            record_cache_result("api_keys", "coalesced")
+            account = await asyncio.shield(in_flight)
+            if account is not leader_cancelled:
+                return account
+            # The request that called the resolver was cancelled, so one of the waiting requests calls it instead
+
+    async def _lead(self, key: str) -> ApiKeyAccount | None:
+        record_cache_result("api_keys", "miss")
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            account = await self.resolver.resolve(key)
+        except asyncio.CancelledError:
+            # Only this request is cancelled, the requests waiting for it retry the lookup
+            del self._in_flight[key]
+            future.set_result(leader_cancelled)
+            raise
+        except Exception as error:
+            del self._in_flight[key]
+            future.set_exception(error)
+            # Marks the exception as retrieved when no other request was waiting for it
+            future.exception()
+            raise
+        del self._in_flight[key]
+        self._store(key, account)
+        future.set_result(account)
+        return account
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+def default_key_resolver() -> KeyResolver:
+    keys_file = os.getenv("API_KEYS_FILE")
+    if keys_file:
+        return StaticKeyResolver.from_file(keys_file)
+    return AnyKeyResolver()
+
+def create_key_cache(resolver: KeyResolver) -> CachedKeyResolver:
+    return CachedKeyResolver(
+        resolver,
+        max_size=int(os.getenv("API_KEY_CACHE_SIZE", 10_000)),
+        ttl=float(os.getenv("API_KEY_CACHE_TTL", 300)),
+        negative_ttl=float(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", 30)),
+    )
+
+api_keys = create_key_cache(default_key_resolver())
+
+def configure_key_resolver(resolver: KeyResolver):
+    """Resolves keys with resolver from now on, starting with an empty cache."""
+    api_keys.resolver = resolver
+    api_keys.clear()
@@ -2,13 +2,17 @@
 from enum import Enum
 from typing import Annotated
 
-from fastapi import HTTPException, Header, status
+from fastapi import HTTPException, Header, Request, status
+
+from app.api.v1.common.api_keys import api_keys
+from app.api.v1.common.rate_limits import bucket_key, endpoint_cost, rate_limits
 
 class APIVersion(str, Enum):
     v1 = "v1"
     """API Version 1 of the Gluey API"""
 
 async def common_headers(
+    request: Request,
     x_key: Annotated[str, Header(..., description="The API key that was assigned by Gluey", example="gl-acc-flsjukcKHJF6iHFi66666f3r99kv")],
     x_version: Annotated[APIVersion, Header(..., description="The API version to use", example="v1")]
 ):
@@ -16,4 +20,16 @@ async def common_headers(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="x-key header missing")
     if not x_version:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="x-version header missing")
-    return {"x-key": x_key, "x-version": x_version}
\ No newline at end of file
+
+    account = await api_keys.resolve(x_key)
+    if account is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated.")
+
+    if rate_limits is not None:
+        key = bucket_key(account.account_number, request.client.host if request.client else None)
+        limit = await rate_limits.take_async(key, endpoint_cost(request.method, request.scope["route"].path))
+        if not limit.allowed:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Rate limit exceeded.", headers=limit.headers())
+        # Added to whichever response the route returns by the finish_response middleware in app.main
+        request.state.rate_limit = limit
+    return {"x-key": x_key, "x-version": x_version, "account": account}
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""Token-bucket rate limits per account, shared by every Uvicorn worker on the host through a memory-mapped file.
+
+Each account gets a bucket of RATE_LIMIT_CAPACITY tokens that refills at RATE_LIMIT_REFILL_PER_SECOND. A request takes the cost
+of its endpoint from `endpoint_costs` (1 when not listed), and is answered with 429 when the bucket does not hold enough.
+Set RATE_LIMIT_CAPACITY=0 to turn the limits off.
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+# (method, route path): tokens taken by one request. Batch endpoints cost more than the single-item ones, but none costs
+# more than a third of the default capacity, so a client can mix them with other calls without a full bucket.
+endpoint_costs = {
+    ("POST", "/track"): 10,
+    ("POST", "/track/stream"): 30,
+    ("POST", "/parcels/track"): 10,
+    ("GET", "/pudo"): 5,
+    ("POST", "/shipments"): 2,
+    ("POST", "/shipments/{id}/labels"): 2,
+    ("POST", "/shipments/{id}/documents"): 2,
+    ("POST", "/manifests"): 5,
+}
+
+capacity = float(os.getenv("RATE_LIMIT_CAPACITY", 100))
+refill_per_second = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", 10))
+buckets_file = os.getenv("RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "gluey-rate-limits"))
+
+# One bucket: hash of the key, tokens left, and the monotonic time they were counted. CLOCK_MONOTONIC is shared by every
+# process on a Linux host, so the times written by one worker are valid in the others.
+bucket = struct.Struct("<Qdd")
+
+# Buckets probed from a key's home slot before the least recently used one of them is taken over
+probe_length = 16
+
+class RateLimitResult:
+    def __init__(self, limit: float, window: float, allowed: bool, remaining: float, reset: float, retry_after: float):
+        self.limit = limit
+        self.window = window
+        self.allowed = allowed
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(int(self.limit)),
+            "RateLimit-Remaining": str(int(self.remaining)),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": f"{int(self.limit)};w={math.ceil(self.window)}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+class SharedTokenBuckets:
+    """A fixed-size hash table of token buckets in a memory-mapped file, locked with flock while a bucket is updated."""
+
+    def __init__(self, path: str | None = buckets_file, slots: int = 65536):
+        self.path = path
+        self.slots = slots
+        self._fd = None
+        self._map = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Maps the file on first use in each process. A descriptor inherited from a parent that forked after import would
+        be shared by every worker, and so would its flock, which then no longer keeps them apart."""
+        if self._map is not None:
+            # Inherited from the parent, which keeps its own open file
+            self._map.close()
+            if self._fd is not None:
+                os.close(self._fd)
+        size = bucket.size * self.slots
+        if self.path:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+        else:
+            self._fd = None
+            self._map = mmap.mmap(-1, size)
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self, blocking: bool = True):
+        """Raises BlockingIOError without waiting when blocking is False and another thread or worker holds the lock."""
+        if not self._lock.acquire(blocking):
+            raise BlockingIOError("The rate-limit buckets are locked by another thread")
+        try:
+            if self._pid != os.getpid():
+                self._open()
+            if self._fd is None:
+                yield
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    def _slot(self, key_hash: int) -> tuple[int, bool]:
+        """The slot of key_hash, and whether it already holds its bucket."""
+        home = key_hash % self.slots
+        least_recent, least_recent_time = home, math.inf
+        for probe in range(probe_length):
+            index = (home + probe) % self.slots
+            stored_hash, _, updated = bucket.unpack_from(self._map, index * bucket.size)
+            if stored_hash == key_hash:
+                return index, True
+            if stored_hash == 0:
+                return index, False
+            if updated < least_recent_time:
+                least_recent, least_recent_time = index, updated
+        return least_recent, False
+
+    def take(self, key: str, cost: float, capacity: float = capacity, refill_per_second: float = refill_per_second, blocking: bool = True) -> RateLimitResult:
+        # 0 marks an empty slot
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+        cost = min(cost, capacity)
+        now = time.monotonic()
+        with self._locked(blocking):
+            index, found = self._slot(key_hash)
+            tokens = capacity
+            if found:
+                _, tokens, updated = bucket.unpack_from(self._map, index * bucket.size)
+                tokens = min(capacity, tokens + max(0.0, now - updated) * refill_per_second)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            bucket.pack_into(self._map, index * bucket.size, key_hash, tokens, now)
+
+        return RateLimitResult(
+            limit=capacity,
+            window=capacity / refill_per_second,
+            allowed=allowed,
+            remaining=tokens,
+            reset=(capacity - tokens) / refill_per_second,
+            retry_after=0.0 if allowed else (cost - tokens) / refill_per_second,
+        )
+
+    async def take_async(self, key: str, cost: float) -> RateLimitResult:
+        """take() without blocking the event loop. The lock is only held for a few microseconds, so it is tried without
+        waiting first, and only waited for in the threadpool when another worker holds it."""
+        try:
+            return self.take(key, cost, blocking=False)
+        except BlockingIOError:
+            return await run_in_threadpool(self.take, key, cost)
+
+def bucket_key(account_number: str | None, client_host: str | None) -> str:
+    """The bucket of a request: its account's, which every key of the account shares. AnyKeyResolver accepts every key
+    without an account, so there it is the client address's, as a new key per request would get a full bucket each time."""
+    return f"account:{account_number}" if account_number else f"client:{client_host}"
+
+def endpoint_cost(method: str, route_path: str) -> float:
+    return endpoint_costs.get((method, route_path), 1)
+
+rate_limits = SharedTokenBuckets() if capacity > 0 else None
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Body, Depends, Path, Query, status
 
 from app.api.v1.common.headers import common_headers
+from app.api.v1.common.routing import RawBodyRoute
 from app.api.v1.common.models.base_models import Document
 from app.api.v1.label.models.api.base_shipment_response import BaseShipmentResponseModel
 from app.api.v1.label.models.api.carrier import CarrierService
@@ -16,7 +17,7 @@ from app.api.v1.label.http_responses.response_examples import http_responses_can
 from app.api.v1.label.models.api.update_shipment import UpdateShipmentRequest
 
 
-router = APIRouter()
+router = APIRouter(route_class=RawBodyRoute)
 
 @router.post("/shipments", description="Endpoint to create a shipment synchronous in Gluey.", summary="Create Shipment Sync", responses=http_create_shipment_response, status_code=status.HTTP_201_CREATED)
 async def create_shipment(payload: CreateShipmentRequest, headers: dict = Depends(common_headers)) -> BaseShipmentResponseModel:
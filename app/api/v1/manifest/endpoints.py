@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, Path, status
 
 from app.api.v1.common.headers import common_headers
+from app.api.v1.common.routing import RawBodyRoute
 from app.api.v1.manifest.models.api.get_manifest_response import GetManifestResponse
 from app.api.v1.manifest.models.api.manifest_shipment_request import ManifestShipmentRequest
 from app.api.v1.manifest.models.api.manifest_shipment_response import ManifestShipmentResponse
@@ -9,7 +10,7 @@ from app.api.v1.manifest.models.api.manifest_shipments_response import ManifestS
 
 from app.api.v1.manifest.http_responses.payloads import http_create_manifest_response, http_get_manifest_response
 
-router = APIRouter()
+router = APIRouter(route_class=RawBodyRoute)
 
 @router.post("/shipments/{id}/manifests", description="Endpoint to manifest a previously created shipment and get related carrier documents", summary="Manifest Single Shipment", responses=http_create_manifest_response, status_code=status.HTTP_201_CREATED)
 async def shipment_manifest(payload: ManifestShipmentRequest, id: str = Path(..., description="Glueys own unique identifier of the shipment"), headers: dict = Depends(common_headers)) -> ManifestShipmentResponse:
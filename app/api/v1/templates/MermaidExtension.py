@@ -1,17 +1,91 @@
 from markdown.extensions import Extension
 from markdown.preprocessors import Preprocessor
-import mermaid as mmd
-from mermaid.graph import Graph
 
+import argparse
+import base64
+import hashlib
+import hmac
+import html
+import os
 import re
 import string
+import urllib.request
 
 def strip_notprintable(myStr):
     return ''.join(filter(lambda x: x in string.printable, myStr))
 
 MermaidRegex = re.compile(r"^(?P<mermaid_sign>[\~\`]){3}[\ \t]*[Mm]ermaid[\ \t]*$")
 
+svg_directory = "./app/api/v1/templates/mermaid"
+
+# Served from /static once vendored, so that pages without pre-built SVGs do not depend on a third-party CDN
+mermaid_js_version = "10.9.1"
+mermaid_js_url = f"https://cdn.jsdelivr.net/npm/mermaid@{mermaid_js_version}/dist/mermaid.min.js"
+mermaid_js_path = "./app/static/mermaid.min.js"
+# Hex sha256 of the pinned mermaid.min.js. Vendoring refuses to write a download without it, or with another digest
+mermaid_js_sha256 = os.getenv("MERMAID_JS_SHA256")
+
+def mermaid_js_src(path: str = mermaid_js_path) -> str:
+    """Where the guide pages load mermaid.js from: /static when it is vendored, otherwise the same pinned version from the CDN."""
+    return "/static/mermaid.min.js" if os.path.isfile(path) else mermaid_js_url
+
+def mermaid_js_integrity(sha256: str | None = mermaid_js_sha256) -> str | None:
+    """The subresource integrity of the pinned mermaid.js, so the browser rejects any other script from the CDN."""
+    return f"sha256-{base64.b64encode(bytes.fromhex(sha256)).decode()}" if sha256 else None
+
+def diagram_hash(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+class MermaidSvgCache:
+    """Content-addressed store of pre-rendered Mermaid SVGs, read from `<sha256 of diagram source>.svg` files on disk.
+
+    Never makes network calls; diagrams without a pre-built SVG are recorded in `misses` so they can be built with `prebuild_svgs`.
+    """
+
+    def __init__(self, directory: str = svg_directory):
+        self.directory = directory
+        self.misses: dict[str, str] = {}
+        self._svgs: dict[str, str] = {}
+
+    def get(self, source: str) -> str | None:
+        key = diagram_hash(source)
+        if key in self._svgs:
+            return self._svgs[key]
+
+        path = os.path.join(self.directory, f"{key}.svg")
+        if not os.path.isfile(path):
+            # Misses are not cached, so an SVG built after startup is picked up by the next render
+            self.misses[key] = source
+            return None
+
+        with open(path, "r", encoding="utf-8") as svg_file:
+            svg = svg_file.read()
+        self._svgs[key] = svg
+        self.misses.pop(key, None)
+        return svg
+
+    def version(self) -> int:
+        """The mtime of the SVG directory, which changes whenever an SVG is added or removed. 0 if there is no directory yet."""
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def save(self, source: str, svg: str):
+        key = diagram_hash(source)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{key}.svg"), "w", encoding="utf-8") as svg_file:
+            svg_file.write(svg)
+        self._svgs[key] = svg
+        self.misses.pop(key, None)
+
+svg_cache = MermaidSvgCache()
+
 class MermaidPreprocessor(Preprocessor):
+    def __init__(self, md=None, svg_cache: MermaidSvgCache = svg_cache):
+        super().__init__(md)
+        self.svg_cache = svg_cache
+
     def run(self, lines):
         old_line = ""
         new_lines = []
@@ -38,12 +112,18 @@ class MermaidPreprocessor(Preprocessor):
                 if not is_mermaid:
                     is_mermaid = True
                     #new_lines.append('<style type="text/css"> @import url("https://cdn.rawgit.com/knsv/mermaid/0.5.8/dist/mermaid.css"); </style>')
-                new_lines.append('<div class="mermaid">')
                 m_start = None
             elif m_end:
-                graph = Graph('simple','\n'.join(mermaid_lines))
-                svg = mmd.Mermaid(graph)
-                new_lines.append(svg.svg_response.text)
+                source = '\n'.join(mermaid_lines)
+                svg = self.svg_cache.get(source)
+                if svg:
+                    # data-processed stops mermaid.js from re-rendering a diagram that is already an SVG
+                    new_lines.append('<div class="mermaid" data-processed="true">')
+                    new_lines.append(svg)
+                else:
+                    # No pre-built SVG, so leave the source for mermaid.js to render in the browser
+                    new_lines.append('<div class="mermaid">')
+                    new_lines.extend(html.escape(line, quote=False) for line in mermaid_lines if line.strip())
                 new_lines.append('</div>')
                 new_lines.append("")
                 m_end = None
@@ -61,12 +141,66 @@ class MermaidPreprocessor(Preprocessor):
 class MermaidExtension(Extension):
     """ Add source code hilighting to markdown codeblocks. """
 
+    def __init__(self, svg_cache: MermaidSvgCache = svg_cache, **kwargs):
+        self.svg_cache = svg_cache
+        super().__init__(**kwargs)
+
     def extendMarkdown(self, md):
         """ Add HilitePostprocessor to Markdown instance. """
         # Insert a preprocessor before ReferencePreprocessor
-        md.preprocessors.register(MermaidPreprocessor(md), 'mermaid', 35)
+        md.preprocessors.register(MermaidPreprocessor(md, self.svg_cache), 'mermaid', 35)
 
         md.registerExtension(self)
 
 def makeExtension(**kwargs):  # pragma: no cover
-    return MermaidExtension(**kwargs)
\ No newline at end of file
+    return MermaidExtension(**kwargs)
+
+def prebuild_svgs(markdown_directory: str = "./app/api/v1/templates/markdown", cache: MermaidSvgCache = svg_cache) -> list[str]:
+    """Render every diagram in the markdown guides that has no SVG on disk yet. Build-time only, as this calls the Mermaid renderer over the network."""
+    import mermaid as mmd
+    from mermaid.graph import Graph
+
+    preprocessor = MermaidPreprocessor(svg_cache=cache)
+    for markdown_file in sorted(os.listdir(markdown_directory)):
+        if markdown_file.endswith(".md"):
+            with open(os.path.join(markdown_directory, markdown_file), "r", encoding="utf-8") as md_file:
+                preprocessor.run(md_file.read().split("\n"))
+
+    built = []
+    for key, source in list(cache.misses.items()):
+        graph = Graph('simple', source)
+        cache.save(source, mmd.Mermaid(graph).svg_response.text)
+        built.append(key)
+    return built
+
+def vendor_mermaid_js(path: str = mermaid_js_path, url: str = mermaid_js_url, sha256: str | None = mermaid_js_sha256) -> bool:
+    """Download the pinned mermaid.js into the static directory unless it is already there. Build-time only.
+
+    Raises ValueError, and writes nothing, when no sha256 is given or the download does not match it.
+    """
+    if os.path.isfile(path):
+        return False
+    if not sha256:
+        raise ValueError("The sha256 of mermaid.min.js is required: set MERMAID_JS_SHA256 or pass --sha256")
+    with urllib.request.urlopen(url) as response:
+        script = response.read()
+    digest = hashlib.sha256(script).hexdigest()
+    if not hmac.compare_digest(digest, sha256.lower()):
+        raise ValueError(f"{url} has sha256 {digest}, expected {sha256}")
+    with open(path, "wb") as js_file:
+        js_file.write(script)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the SVGs of the Mermaid diagrams in the markdown guides.")
+    parser.add_argument("markdown_directory", nargs="?", default="./app/api/v1/templates/markdown")
+    parser.add_argument("--mermaid-js", action="store_true", help=f"Only download mermaid.js {mermaid_js_version} to {mermaid_js_path} if it is missing")
+    parser.add_argument("--sha256", default=mermaid_js_sha256, help="Expected sha256 of the downloaded mermaid.js (default: MERMAID_JS_SHA256)")
+    args = parser.parse_args()
+
+    if args.mermaid_js:
+        if vendor_mermaid_js(sha256=args.sha256):
+            print(mermaid_js_path)
+    else:
+        for key in prebuild_svgs(args.markdown_directory):
+            print(f"{key}.svg")
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import os
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from app.metrics import record_cache
+
+if TYPE_CHECKING:
+    import markdown
+
+markdown_directory = "./app/api/v1/templates/markdown"
+
+def create_markdown_pipeline() -> markdown.Markdown:
+    # Imported here so that markdown, Pygments and the Mermaid extension are only loaded when the first guide page is rendered
+    import markdown
+    from markdown.extensions.codehilite import CodeHiliteExtension
+    from markdown.extensions.extra import ExtraExtension
+    from markdown.extensions.toc import TocExtension
+    from app.api.v1.templates.MermaidExtension import MermaidExtension
+
+    return markdown.Markdown(extensions=[
+        MermaidExtension(),
+        CodeHiliteExtension(linenums=False, guess_lang=False, use_pygments=True, pygments_formatter="html", css_class="highlight"),
+        ExtraExtension(),
+        TocExtension(toc_depth="2-3")])
+
+class MarkdownPageCache:
+    """Rendered HTML of the markdown guide pages, keyed by file path and re-rendered when the file's or the Mermaid SVG directory's mtime changes."""
+
+    def __init__(self, directory: str = markdown_directory):
+        self.directory = directory
+        self._pages: dict[str, tuple[tuple[int, int], str]] = {}
+        self._pipeline: markdown.Markdown = None
+        self._lock = Lock()
+
+    def get(self, markdown_file: str) -> str:
+        from app.api.v1.templates.MermaidExtension import svg_cache
+
+        path = os.path.join(self.directory, markdown_file)
+        # A new pre-built SVG changes the rendered page as well, so it is part of the version
+        version = (os.stat(path).st_mtime_ns, svg_cache.version())
+
+        cached = self._pages.get(path)
+        if cached and cached[0] == version:
+            record_cache("markdown", hit=True)
+            return cached[1]
+
+        record_cache("markdown", hit=False)
+        with self._lock:
+            cached = self._pages.get(path)
+            if cached and cached[0] == version:
+                return cached[1]
+
+            if self._pipeline is None:
+                self._pipeline = create_markdown_pipeline()
+
+            with open(path, "r", encoding="utf-8") as md_file:
+                md_content = md_file.read()
+            html_content = self._pipeline.reset().convert(md_content)
+
+            self._pages[path] = (version, html_content)
+            return html_content
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+markdown_pages = MarkdownPageCache()
@@ -1,18 +1,199 @@
-from fastapi import APIRouter, Depends, Path
+from datetime import datetime
+from email.utils import format_datetime
+import os
+import tempfile
+from typing import Callable, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response, UploadFile, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from starlette.background import BackgroundTask
 
 from app.api.v1.common.headers import common_headers
-from app.api.v1.tracking.models.api.track_shipments_request import TrackShipmentsRequest
-from app.api.v1.tracking.models.api.track_batch import BatchTrackShipment
+from app.api.v1.common.routing import RawBodyRoute, is_json, type_adapter
+from app.api.v1.tracking.models.api.track_shipments_request import ShipmentIdType, StreamTrackShipmentsRequest, TrackShipmentsRequest
+from app.api.v1.tracking.models.api.track_batch import BatchTrackShipment, BatchTrackStreamLine
 from app.api.v1.tracking.models.api.track_single_shipment import TrackSingleShipment
+from app.api.v1.tracking.models.api.track_parcel import BatchTrackParcel, TrackParcelsRequest
+from app.api.v1.tracking.models.api.tracking_event import TrackingEventParcel
+from app.api.v1.tracking.store import EventKey, TrackedParcel, TrackedShipment, default_event_limit, event_key, max_event_limit, tracker, uploaded_ids
+from app.http_cache import http_date, modified_since
+from app.responses import NDJSONResponse, model_response
+
+from app.api.v1.tracking.http_responses.payloads import http_get_parcel_tracking_response, http_get_tracking_response, http_stream_tracking_response, stream_tracking_request_body
+
+# Uploaded ID files are kept in memory up to this size, and spooled to a temporary file after that
+spool_size = 1024 * 1024
+max_upload_size = int(os.getenv("TRACK_STREAM_MAX_UPLOAD_BYTES", 256 * 1024 * 1024))
+
+router = APIRouter(route_class=RawBodyRoute)
+
+since_query = Query(None, description="Only return the tracking events created after this date and time, e.g. the `x-last-updated` header of your previous request. In ISO 8601 format, e.g. '2021-06-01T12:00:00Z'.")
+since_sequence_query = Query(None, ge=0, description="The `x-last-sequence` header of your previous request, sent together with `since`. The tracking events created exactly at `since` that were stored after it are returned as well, so none are missed when several are created at the same time.")
+limit_query = Query(default_event_limit, ge=1, le=max_event_limit, description=f"The number of latest tracking events to return for each shipment, at most {max_event_limit}.")
+
+before_query = Query(None, description="Only return the tracking events created before this date and time, i.e. the `x-next-before` header of the newer page.")
+
+def iso_utc(moment: datetime) -> str:
+    return moment.isoformat().replace("+00:00", "Z")
+
+def last_updated_headers(last_updated: Optional[datetime], last_sequence: int) -> dict[str, str]:
+    if last_updated is None:
+        return {}
+    return {"x-last-updated": iso_utc(last_updated), "x-last-sequence": str(last_sequence), "Last-Modified": format_datetime(last_updated, usegmt=True)}
+
+def single_shipment(shipment: BatchTrackShipment) -> TrackSingleShipment:
+    return TrackSingleShipment(uuid_ref=shipment.uuid_ref, tracking_level=shipment.tracking_level, parcels=shipment.parcels or None, tracking_data=shipment.tracking_data)
+
+def requested_after(request: Request, after: Optional[EventKey]) -> Optional[EventKey]:
+    """after, or when the request has no `since`, the date of its If-Modified-Since header. That only has a resolution of
+    seconds, so the events created in the second of the date are returned again."""
+    if after is not None:
+        return after
+    return event_key(http_date(request.headers.get("if-modified-since")), 0)
+
+def page_response(request: Request, tracked: TrackedShipment | TrackedParcel, after: Optional[EventKey], before: Optional[datetime], limit: int, content: Callable[[BaseModel], BaseModel] = lambda content: content) -> Response:
+    """A page of the events of one shipment or parcel, or 304 / 204 when there are no (new) events."""
+    response_headers = last_updated_headers(tracked.last_updated, tracked.last_sequence)
+    if tracked.last_updated and not modified_since(request.headers.get("if-modified-since"), tracked.last_updated):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
+    page = tracked.page(requested_after(request, after), before, limit)
+    if page.next_before:
+        response_headers["x-next-before"] = iso_utc(page.next_before)
+    if not page.events:
+        return Response(status_code=status.HTTP_204_NO_CONTENT, headers=response_headers)
+    return model_response(content(page.content), headers=response_headers)
+
+def batch_response(request: Request, tracked: list[tuple[str, TrackedShipment | TrackedParcel]], after: Optional[EventKey], content: Callable[[str, TrackedShipment | TrackedParcel, Optional[EventKey]], BaseModel]) -> Response:
+    """The latest events of every tracked shipment or parcel, by its ID from the request, that was updated after after, or 304 / 204 when none were."""
+    last_updated = max((item.last_updated for _, item in tracked if item.last_updated), default=None)
+    response_headers = last_updated_headers(last_updated, max((item.last_sequence for _, item in tracked), default=0))
+    if last_updated and not modified_since(request.headers.get("if-modified-since"), last_updated):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
+    after = requested_after(request, after)
+    updated = [content(id, item, after) for id, item in tracked if item.updated_since(after)]
+    if not updated:
+        return Response(status_code=status.HTTP_204_NO_CONTENT, headers=response_headers)
+    return model_response(updated, headers=response_headers)
+
+@router.get("/shipments/{id}/track", description="Endpoint to fetch tracking events for a previously created shipment. "
+            "Send `since` and `since_sequence`, or an `If-Modified-Since` header with the `Last-Modified` of your previous response, to only get the tracking events that were created after your previous request. "
+            "`If-Modified-Since` only has a resolution of seconds, so the events created in its last second are sent again. "
+            "The latest `limit` tracking events are returned, newest last. When the shipment has older ones, the `x-next-before` header is set: send it as `before` to get the page before.",
+            summary="Track Single Shipment", responses=http_get_tracking_response)
+async def shipment_track(
+    request: Request,
+    id: str = Path(..., description="Glueys own unique identifier of the shipment"),
+    since: Optional[datetime] = since_query,
+    since_sequence: Optional[int] = since_sequence_query,
+    before: Optional[datetime] = before_query,
+    limit: int = limit_query,
+    headers: dict = Depends(common_headers)) -> TrackSingleShipment:
+    tracked = await tracker.shipment(id)
+    if tracked is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shipment not found.")
+    return page_response(request, tracked, event_key(since, since_sequence), before, limit, single_shipment)
+
+@router.post("/track", description="Endpoint to batch track up to 100 shipments at the same time. "
+             "Send `since` and `since_sequence`, or an `If-Modified-Since` header, to only get the shipments with tracking events that were created after your previous request, and only those events. "
+             "Each shipment has its latest `limit` tracking events, use `GET /shipments/{id}/track` to page through older ones.",
+             summary="Batch Track Shipments", responses=http_get_tracking_response)
+async def track(
+    request: Request,
+    payload: TrackShipmentsRequest,
+    since: Optional[datetime] = since_query,
+    since_sequence: Optional[int] = since_sequence_query,
+    limit: int = limit_query,
+    headers: dict = Depends(common_headers)) -> list[BatchTrackShipment]:
+    shipments = await tracker.shipments(payload.ids, payload.id_type)
+    if not shipments:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shipment not found.")
+    return batch_response(request, [(tracked.id, tracked) for tracked in shipments], event_key(since, since_sequence), lambda _, tracked, after: tracked.page(after, limit=limit).content)
+
+@router.get("/track/carrier/{carrier_tracking_id}", description="Endpoint to fetch tracking events for a shipment by the carriers tracking id, of the shipment or of one of its parcels. "
+            "New tracking ids that the carrier assigns, e.g. when a parcel is over-labelled at their hub, are followed, so both the original and the new tracking ids find the shipment. "
+            "`since`, `since_sequence`, `If-Modified-Since`, `limit` and `before` work as for `GET /shipments/{id}/track`.",
+            summary="Track Single Shipment by Carrier Tracking ID", responses=http_get_tracking_response)
+async def carrier_tracking_id_track(
+    request: Request,
+    carrier_tracking_id: str = Path(..., description="The carriers own tracking id for the shipment or one of its parcels"),
+    since: Optional[datetime] = since_query,
+    since_sequence: Optional[int] = since_sequence_query,
+    before: Optional[datetime] = before_query,
+    limit: int = limit_query,
+    headers: dict = Depends(common_headers)) -> TrackSingleShipment:
+    tracked = await tracker.shipment(carrier_tracking_id, ShipmentIdType.CARRIER_TRACKING_ID)
+    if tracked is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shipment not found.")
+    return page_response(request, tracked, event_key(since, since_sequence), before, limit, single_shipment)
+
+@router.get("/shipments/{id}/parcels/{parcel_id}/track", description="Endpoint to fetch tracking events for one parcel of a shipment with `tracking_level=parcel`, without the other parcels of the shipment. "
+            "`since`, `since_sequence`, `If-Modified-Since`, `limit` and `before` work as for `GET /shipments/{id}/track`.",
+            summary="Track Single Parcel", responses=http_get_parcel_tracking_response)
+async def parcel_track(
+    request: Request,
+    id: str = Path(..., description="Glueys own unique identifier of the shipment"),
+    parcel_id: str = Path(..., description="Glueys own unique identifier of the parcel"),
+    since: Optional[datetime] = since_query,
+    since_sequence: Optional[int] = since_sequence_query,
+    before: Optional[datetime] = before_query,
+    limit: int = limit_query,
+    headers: dict = Depends(common_headers)) -> TrackingEventParcel:
+    tracked = await tracker.parcel(id, parcel_id)
+    if tracked is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcel not found.")
+    return page_response(request, tracked, event_key(since, since_sequence), before, limit)
 
-from app.api.v1.tracking.http_responses.payloads import http_get_tracking_response
+@router.post("/parcels/track", description="Endpoint to batch track up to 100 parcels at the same time, by Gluey parcel ID or by the carriers tracking id, without the other parcels of their shipments. "
+             "`since`, `since_sequence`, `If-Modified-Since` and `limit` work as for `POST /track`.",
+             summary="Batch Track Parcels", responses=http_get_parcel_tracking_response)
+async def track_parcels(
+    request: Request,
+    payload: TrackParcelsRequest,
+    since: Optional[datetime] = since_query,
+    since_sequence: Optional[int] = since_sequence_query,
+    limit: int = limit_query,
+    headers: dict = Depends(common_headers)) -> list[BatchTrackParcel]:
+    parcels = await tracker.parcels(payload.ids, payload.id_type)
+    if not parcels:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcel not found.")
+    return batch_response(request, parcels, event_key(since, since_sequence), lambda id, tracked, after: BatchTrackParcel(id=id, shipment_id=tracked.shipment_id, parcel=tracked.page(after, limit=limit).content))
 
-router = APIRouter()
+async def spooled_body(request: Request) -> UploadFile:
+    # UploadFile writes and seeks in the threadpool once the body has rolled over to disk
+    body = UploadFile(tempfile.SpooledTemporaryFile(max_size=spool_size))
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_upload_size:
+            await body.close()
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"The uploaded IDs are larger than {max_upload_size // (1024 * 1024)} MB.")
+        await body.write(chunk)
+    await body.seek(0)
+    return body
 
-@router.get("/shipments/{id}/track", description="Endpoint to fetch tracking events for a previously created shipment", summary="Track Single Shipment", responses=http_get_tracking_response)
-async def shipment_track(id: str = Path(..., description="Glueys own unique identifier of the shipment"), headers: dict = Depends(common_headers)) -> TrackSingleShipment:
-    return
+@router.post("/track/stream", description="Endpoint to batch track any number of shipments. Send up to 10 000 IDs as JSON, or any number as a `text/plain` upload of up to 256 MB with one ID per line. "
+             "The tracking data is streamed back as newline-delimited JSON, one line per ID in the order of the request, as soon as each batch of shipments is found. "
+             "Every line has a `cursor`: if the stream is interrupted, send the same IDs again with the `cursor` of the last line you received to continue after it.",
+             summary="Stream Batch Track Shipments", response_model=BatchTrackStreamLine, response_class=StreamingResponse, responses=http_stream_tracking_response, openapi_extra={"requestBody": stream_tracking_request_body})
+async def track_stream(
+    request: Request,
+    cursor: int = Query(0, ge=0, description="The `cursor` of the last line received from an interrupted stream. The IDs up to and including that line are skipped."),
+    since: Optional[datetime] = since_query,
+    since_sequence: Optional[int] = since_sequence_query,
+    limit: int = limit_query,
+    id_type: ShipmentIdType = Query(ShipmentIdType.SHIPMENT_ID, description="The kind of IDs in the request, 'shipment_id' or 'carrier_tracking_id'."),
+    headers: dict = Depends(common_headers)):
+    content_type = request.headers.get("content-type", "")
+    if content_type.split(";")[0].strip().lower() == "text/plain":
+        body = await spooled_body(request)
+        return NDJSONResponse(tracker.stream(uploaded_ids(body.file), cursor, event_key(since, since_sequence), limit, id_type, blocking_ids=True), background=BackgroundTask(body.close))
+    if not is_json(content_type):
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Send the IDs as application/json or text/plain.")
 
-@router.post("/track", description="Endpoint to batch track up to 100 shipments at the same time", summary="Batch Track Shipments", responses=http_get_tracking_response)
-async def track(payload: TrackShipmentsRequest, headers: dict = Depends(common_headers)) -> list[BatchTrackShipment]:
-    return
\ No newline at end of file
+    try:
+        payload = type_adapter(StreamTrackShipmentsRequest).validate_json(await request.body())
+    except ValidationError as error:
+        raise RequestValidationError([{**detail, "loc": ("body", *detail["loc"])} for detail in error.errors(include_url=False)])
+    return NDJSONResponse(tracker.stream(payload.ids, cursor, event_key(since, since_sequence), limit, id_type))
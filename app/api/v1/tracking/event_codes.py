@@ -0,0 +1,78 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Path, Query, Response, status
+
+from app.api.v1.common.routing import RawBodyRoute
+
+from app.api.v1.tracking.models.api.event_codes import CatalogueVersion, EventCodeCatalogueDiff, EventCodeQuery, ResolveEventCodesRequest
+from app.api.v1.tracking.models.base_models import GlueyEventCodeDetail, GlueyMilestone
+from app.event_codes import EventCodeView, catalogues, diff_views, event_codes
+from app.http_cache import strong_etag
+from app.responses import dumps, model_response
+
+# The catalogue view with every Gluey tracking event code
+lookup_view = "all_events"
+
+router = APIRouter(tags=['Tracking Event Codes'], route_class=RawBodyRoute)
+
+def event_code_detail(event: dict) -> GlueyEventCodeDetail:
+    return GlueyEventCodeDetail(milestone=event["milestone"], code=event["code"], sub_code=event["sub_code"], freetext_detail=event["description"])
+
+def resolve_event_codes(view: EventCodeView, queries: list[EventCodeQuery]) -> list[Optional[GlueyEventCodeDetail]]:
+    resolved = []
+    for query in queries:
+        event = view.by_event.get((query.milestone.value, query.code, query.sub_code))
+        resolved.append(event_code_detail(event) if event else None)
+    return resolved
+
+# (from_version, to_version) -> (catalogue revisions, serialized diff, ETag)
+diff_cache = {}
+
+def catalogue_diff(from_version: str, to_version: str) -> tuple[bytes, str]:
+    """The diff document between two catalogue versions, only rebuilt when one of the catalogues is re-loaded."""
+    from_catalogue = catalogues[from_version]
+    to_catalogue = catalogues[to_version]
+    from_view = from_catalogue.file_view(lookup_view)
+    to_view = to_catalogue.file_view(lookup_view)
+
+    revisions = (from_catalogue.revision, to_catalogue.revision)
+    cached = diff_cache.get((from_version, to_version))
+    if cached is None or cached[0] != revisions:
+        diff = diff_views(from_version, from_view, to_version, to_view)
+        body = dumps(diff)
+        cached = (revisions, body, strong_etag(body))
+        diff_cache[(from_version, to_version)] = cached
+    return cached[1], cached[2]
+
+@router.get("/event-codes/diff/{from_version}/{to_version}", description="Endpoint to get the differences between two versions of the tracking event code catalogue, and the mapping of every event code in `from_version` to its equivalent in `to_version`.", summary="Diff Event Code Catalogue Versions", response_model=EventCodeCatalogueDiff)
+async def get_catalogue_diff(
+    from_version: CatalogueVersion = Path(..., description="The older catalogue version, e.g. 'v1'."),
+    to_version: CatalogueVersion = Path(..., description="The newer catalogue version, e.g. 'v2'.")):
+    body, etag = catalogue_diff(from_version.value, to_version.value)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+@router.get("/event-codes/{code}", description="Endpoint to look up all sub codes of a Gluey tracking event code.", summary="Look Up Event Code")
+async def get_event_code(
+    code: str = Path(..., description="The code of the tracking event, e.g. 'delivered'."),
+    milestone: Optional[GlueyMilestone] = Query(None, description="Only return the sub codes of this milestone.")) -> list[GlueyEventCodeDetail]:
+    events = event_codes.file_view(lookup_view).by_code.get(code, [])
+    if milestone:
+        events = [event for event in events if event["milestone"] == milestone.value]
+    if not events:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event code not found.")
+    return model_response([event_code_detail(event) for event in events])
+
+@router.get("/event-codes/{code}/{sub_code}", description="Endpoint to look up a Gluey tracking event code and sub code. The same code and sub code can exist under more than one milestone.", summary="Look Up Event Sub Code")
+async def get_event_sub_code(
+    code: str = Path(..., description="The code of the tracking event, e.g. 'delivered'."),
+    sub_code: str = Path(..., description="The subcode of the tracking event, e.g. 'left_with_neighbor'."),
+    milestone: Optional[GlueyMilestone] = Query(None, description="Only return the sub code of this milestone.")) -> list[GlueyEventCodeDetail]:
+    events = event_codes.file_view(lookup_view).by_sub_code.get((code, sub_code), [])
+    if milestone:
+        events = [event for event in events if event["milestone"] == milestone.value]
+    if not events:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event code not found.")
+    return model_response([event_code_detail(event) for event in events])
+
+@router.post("/event-codes/resolve", description="Endpoint to resolve many (milestone, code, sub_code) triples at the same time. The response is in the same order as the request, with `null` for triples that are not in the catalogue.", summary="Resolve Event Codes", status_code=status.HTTP_200_OK)
+async def resolve(payload: ResolveEventCodesRequest) -> list[Optional[GlueyEventCodeDetail]]:
+    return model_response(resolve_event_codes(event_codes.file_view(lookup_view), payload.events))
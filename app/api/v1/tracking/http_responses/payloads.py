@@ -1,3 +1,5 @@
+from app.api.v1.tracking.models.api.track_shipments_request import StreamTrackShipmentsRequest
+
 http_get_tracking_response = {
                 200: {
             "description": "Tracking events found",
@@ -9,7 +11,22 @@ http_get_tracking_response = {
             },
             "headers": {
                 "x-last-updated": {
-                    "description": "The last time the tracking events were updated for this carrier / country",
+                    "description": "The `created_utc` of the latest tracking event of the shipment(s). Send it as `since` in your next request to only get the tracking events created after it.",
+                    "schema": {
+                        "type": "string",
+                        "format": "date-time",
+                        "example": "2021-01-01T00:00:00Z"
+                    }
+                },
+                "x-last-sequence": {
+                    "description": "The sequence of the tracking event that was stored last. Send it as `since_sequence` together with `since`, so that tracking events created at the same time as `x-last-updated` but stored later are not missed.",
+                    "schema": {
+                        "type": "integer",
+                        "example": 42
+                    }
+                },
+                "x-next-before": {
+                    "description": "Only on `GET /shipments/{id}/track`, when the shipment has tracking events older than the ones returned. Send it as `before` to get the page before.",
                     "schema": {
                         "type": "string",
                         "format": "date-time",
@@ -19,7 +36,10 @@ http_get_tracking_response = {
             }
         },
                 204: {
-            "description": "No tracking events available for Shipment"
+            "description": "No tracking events available for Shipment, or none created after `since`"
+        },
+        304: {
+            "description": "No tracking events created after the `If-Modified-Since` header"
         },
         401: {
             "description": "Unauthorized",
@@ -61,4 +81,83 @@ http_get_tracking_response = {
                 }
             }
         }
-    }
\ No newline at end of file
+    }
+
+http_get_parcel_tracking_response = {
+    **http_get_tracking_response,
+    404: {
+        "description": "Parcel Not Found",
+        "content": {
+            "application/json": {
+                "example": {
+                    "detail": "Parcel not found."
+                }
+            }
+        }
+    },
+}
+
+http_stream_tracking_response = {
+    200: {
+        "description": "One line of newline-delimited JSON per shipment ID, in the order of the request",
+        "content": {
+            "application/x-ndjson": {
+                "schema": {"$ref": "#/components/schemas/BatchTrackStreamLine"}
+            }
+        }
+    },
+    401: http_get_tracking_response[401],
+    413: {
+        "description": "Request Entity Too Large. A `text/plain` upload of IDs is limited to 256 MB.",
+        "content": {
+            "application/json": {
+                "example": {
+                    "detail": "The uploaded IDs are larger than 256 MB."
+                }
+            }
+        }
+    },
+    422: {
+        "description": "Validation Error. At most 10 000 IDs can be sent as JSON, upload more as `text/plain` with one ID per line.",
+        "content": {
+            "application/json": {
+                "schema": {"$ref": "#/components/schemas/HTTPValidationError"},
+                "example": {
+                    "detail": [
+                        {
+                            "type": "too_long",
+                            "loc": ["body", "ids"],
+                            "msg": "List should have at most 10000 items after validation, not 10001",
+                            "input": ["..."],
+                            "ctx": {"field_type": "List", "max_length": 10000, "actual_length": 10001}
+                        }
+                    ]
+                }
+            }
+        }
+    },
+    415: {
+        "description": "Unsupported Media Type",
+        "content": {
+            "application/json": {
+                "example": {
+                    "detail": "Send the IDs as application/json or text/plain."
+                }
+            }
+        }
+    },
+    500: http_get_tracking_response[500],
+}
+
+stream_tracking_request_body = {
+    "required": True,
+    "content": {
+        "application/json": {
+            "schema": StreamTrackShipmentsRequest.model_json_schema(),
+        },
+        "text/plain": {
+            "schema": {"type": "string"},
+            "example": "shp_01HZY8TQ3G5N6A\nshp_01HZY8TQ3H2K9B\nshp_01HZY8TQ3J7M4C\n",
+        },
+    },
+}
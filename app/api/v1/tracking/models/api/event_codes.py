@@ -0,0 +1,55 @@
+from enum import Enum
+from typing import Optional
+from pydantic import BaseModel, Field
+
+from app.api.v1.common.utils import get_enum_description
+from app.api.v1.tracking.models.base_models import GlueyMilestone
+
+class EventCodeQuery(BaseModel):
+    milestone: GlueyMilestone = Field(..., description="The Gluey milestone of the tracking event, e.g. 'delivery'.")
+    code: str = Field(..., description="The code of the tracking event, e.g. 'delivered'.")
+    sub_code: str = Field("", description="The subcode of the tracking event, e.g. 'left_with_neighbor'. Leave empty for codes without a subcode.")
+
+class ResolveEventCodesRequest(BaseModel):
+    """The request model to resolve many Gluey tracking event codes at the same time."""
+    events: list[EventCodeQuery] = Field(..., max_length=10000, description="The (milestone, code, sub_code) triples to resolve. Up to 10 000 triples can be resolved in the same request.")
+
+class CatalogueVersion(str, Enum):
+    """The versions of the Gluey tracking event code catalogue."""
+    V1 = "v1"
+    """The catalogue with the milestones of `GlueyMilestone`, e.g. 'start'."""
+    V2 = "v2"
+    """The catalogue that replaces the 'start' milestone with 'order' and uses an empty sub code for codes without further detail."""
+
+class MappingMatch(str, Enum):
+    SAME = "same"
+    RENAMED = "renamed"
+    DESCRIPTION = "description"
+    PARENT = "parent"
+
+mapping_match_descriptions = {
+    MappingMatch.SAME: "The event code exists unchanged in both versions.",
+    MappingMatch.RENAMED: "The code, or its milestone, was renamed in the newer version.",
+    MappingMatch.DESCRIPTION: "An event code with the same description exists in the newer version.",
+    MappingMatch.PARENT: "The sub code does not exist in the newer version, and the event maps to the code without a sub code.",
+}
+
+class CatalogueEventCode(BaseModel):
+    milestone: str = Field(..., description="The milestone of the tracking event in this catalogue version, e.g. 'start' in v1 or 'order' in v2.")
+    code: str = Field(..., description="The code of the tracking event, e.g. 'delivered'.")
+    sub_code: str = Field(..., description="The subcode of the tracking event. Empty for codes without a subcode.")
+
+class EventCodeMapping(BaseModel):
+    from_code: CatalogueEventCode = Field(..., description="The event code in the older catalogue version.")
+    to_code: Optional[CatalogueEventCode] = Field(None, description="The event code it maps to in the newer catalogue version, `null` if it has no equivalent.")
+    match: Optional[MappingMatch] = Field(None, description=f"How the event codes were matched. It can be one of the following:\n{get_enum_description(MappingMatch, mapping_match_descriptions)}")
+
+class EventCodeCatalogueDiff(BaseModel):
+    from_version: CatalogueVersion = Field(..., description="The older catalogue version.")
+    to_version: CatalogueVersion = Field(..., description="The newer catalogue version.")
+    added_milestones: list[str] = Field(..., description="Milestones that only exist in the newer version.")
+    removed_milestones: list[str] = Field(..., description="Milestones that only exist in the older version.")
+    added: list[CatalogueEventCode] = Field(..., description="Event codes that only exist in the newer version.")
+    removed: list[CatalogueEventCode] = Field(..., description="Event codes that only exist in the older version.")
+    changed: list[CatalogueEventCode] = Field(..., description="Event codes that exist in both versions with a different description.")
+    mapping: list[EventCodeMapping] = Field(..., description="Every event code of the older version and the event code it maps to in the newer version.")
@@ -1,4 +1,5 @@
 
+from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, Field
 
@@ -9,7 +10,18 @@ from app.api.v1.tracking.models.api.tracking_event import TrackingData, Tracking
 class BatchTrackShipment(BaseModel):
     id: str = Field(..., description="The ID of the shipment that the tracking event is related to.")
     uuid_ref: Optional[str] = Field(None, description="Your own unique identifier for the shipment.")
+    carrier_tracking_id: Optional[str] = Field(None, description="This is the carriers own tracking id for the shipment as it was assigned in Gluey when the shipment was created.")
     tracking_level: TrackingLevel = Field(..., description=f"Indicates if parcels can be individually trackable (i.e. the carrier support multi-parcel tracking) or if only the shipment itself can be tracked. It can be one of the following:\n{get_enum_description(TrackingLevel, tracking_level_descriptions)}")
     references: References = Field(..., description="The references of the shipment.")
     parcels: list[TrackingEventParcel] = Field([], description="All the parcels included in the shipment.")
-    tracking_data: Optional[TrackingData] = Field(None, description="Available if tracking_level = 'shipment'. The tracking data for the shipment.")
\ No newline at end of file
+    tracking_data: Optional[TrackingData] = Field(None, description="Available if tracking_level = 'shipment'. The tracking data for the shipment.")
+
+class BatchTrackStreamLine(BaseModel):
+    """One line of the newline-delimited JSON stream of `POST /track/stream`."""
+    cursor: int = Field(..., description="The number of IDs of the request that have been answered, including this one. Send it as the `cursor` query parameter, together with the same IDs, to resume a stream that was interrupted.")
+    id: str = Field(..., description="The ID of the shipment from the request.")
+    last_updated: Optional[datetime] = Field(None, description="The `created_utc` of the latest tracking event of the shipment. Send it as `since` to only get the events created after it next time.")
+    last_sequence: Optional[int] = Field(None, description="The sequence of the tracking event of the shipment that was stored last. Send it as `since_sequence` together with `since` to also get the events created at `since` that are stored after it.")
+    next_before: Optional[datetime] = Field(None, description="Set when the shipment has older tracking events than the ones in this line. Send it as `before` to `GET /shipments/{id}/track` to get them.")
+    shipment: Optional[BatchTrackShipment] = Field(None, description="The tracking data of the shipment, `null` when it was not found. It has the latest `limit` tracking events, and with `since` only the ones created after it.")
+    detail: Optional[str] = Field(None, description="Why the shipment could not be tracked, e.g. 'Shipment not found.'.")
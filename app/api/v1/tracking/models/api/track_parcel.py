@@ -0,0 +1,24 @@
+from enum import Enum
+from pydantic import BaseModel, Field
+
+from app.api.v1.common.utils import get_enum_description
+from app.api.v1.tracking.models.api.tracking_event import TrackingEventParcel
+
+class ParcelIdType(str, Enum):
+    PARCEL_ID = "parcel_id"
+    CARRIER_TRACKING_ID = "carrier_tracking_id"
+
+parcel_id_type_descriptions = {
+    ParcelIdType.PARCEL_ID: "Glueys own unique identifier of the parcel.",
+    ParcelIdType.CARRIER_TRACKING_ID: "The carriers own tracking id for the parcel, including the new tracking ids the carrier has assigned since.",
+}
+
+class TrackParcelsRequest(BaseModel):
+    """The request model to get the latest status / tracking events for a list of parcels, without the other parcels of their shipments."""
+    ids: list[str] = Field(..., max_length=100, description="A list of the IDs for the parcels to track. Up to 100 parcels can be tracked in the same request.")
+    id_type: ParcelIdType = Field(ParcelIdType.PARCEL_ID, description=f"The kind of IDs in `ids`. It can be one of the following:\n{get_enum_description(ParcelIdType, parcel_id_type_descriptions)}")
+
+class BatchTrackParcel(BaseModel):
+    id: str = Field(..., description="The ID of the parcel from the request.")
+    shipment_id: str = Field(..., description="The ID of the shipment that the parcel is part of.")
+    parcel: TrackingEventParcel = Field(..., description="The parcel and its tracking data.")
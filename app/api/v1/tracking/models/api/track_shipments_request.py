@@ -1,5 +1,22 @@
+from enum import Enum
 from pydantic import BaseModel, Field
 
+from app.api.v1.common.utils import get_enum_description
+
+class ShipmentIdType(str, Enum):
+    SHIPMENT_ID = "shipment_id"
+    CARRIER_TRACKING_ID = "carrier_tracking_id"
+
+shipment_id_type_descriptions = {
+    ShipmentIdType.SHIPMENT_ID: "Glueys own unique identifier of the shipment.",
+    ShipmentIdType.CARRIER_TRACKING_ID: "The carriers own tracking id for the shipment or one of its parcels, including the new tracking ids the carrier has assigned since, e.g. when a parcel was over-labelled at their hub.",
+}
+
 class TrackShipmentsRequest(BaseModel):
     """The request model to get the latest status / tracking events for a list of shipments."""
-    ids: str = Field([], description="A list of the IDs for the shipments to track. Up to 100 shipments can be tracked in the same request.")
\ No newline at end of file
+    ids: list[str] = Field([], max_length=100, description="A list of the IDs for the shipments to track. Up to 100 shipments can be tracked in the same request. Use `POST /track/stream` for more.")
+    id_type: ShipmentIdType = Field(ShipmentIdType.SHIPMENT_ID, description=f"The kind of IDs in `ids`. It can be one of the following:\n{get_enum_description(ShipmentIdType, shipment_id_type_descriptions)}")
+
+class StreamTrackShipmentsRequest(BaseModel):
+    """The request model to stream the latest status / tracking events for a large list of shipments."""
+    ids: list[str] = Field(..., max_length=10000, description="A list of the IDs for the shipments to track. Up to 10 000 shipments can be tracked in the same JSON request. Upload the IDs as `text/plain`, one per line, to track more.")
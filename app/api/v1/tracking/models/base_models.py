@@ -109,6 +109,15 @@ class GlueyMilestone(str, Enum):
     EXCEPTION = 'exception'
     """All exception events related to the shipment / parcel."""
 
+    RETURN_TO_SENDER = 'return_to_sender'
+    """All events related to the shipment / parcel being returned to the sender."""
+
+    CUSTOMS = 'customs'
+    """All customs clearance events related to the shipment / parcel."""
+
+    ADMIN = 'admin'
+    """All administrative events related to the shipment / parcel, e.g. changes made by the carrier."""
+
     OTHER = 'other'
     """All other events not covered by the other milestone types."""
 
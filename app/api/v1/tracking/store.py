@@ -0,0 +1,379 @@
+"""The tracked shipments served by the tracking endpoints.
+
+Where they come from is pluggable: `configure_shipment_source` takes any `ShipmentSource`. Without one, they are read
+from an in-memory `TrackingStore`, which is empty on the documentation server.
+"""
+import asyncio
+from bisect import bisect_left, bisect_right
+from collections import deque
+from collections.abc import AsyncIterator, Iterable, Iterator
+from datetime import datetime, timezone
+from itertools import chain, count, islice
+import logging
+import math
+import os
+from typing import IO, NamedTuple, Optional, Protocol
+
+import pydantic_core
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from app.api.v1.tracking.models.api.track_batch import BatchTrackShipment, BatchTrackStreamLine
+from app.api.v1.tracking.models.api.track_parcel import ParcelIdType
+from app.api.v1.tracking.models.api.track_shipments_request import ShipmentIdType
+from app.api.v1.tracking.models.api.tracking_event import TrackingEvent, TrackingEventParcel
+from app.api.v1.tracking.models.webhooks.tracking_event import TrackingWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Longest shipment ID read from an uploaded ID file. The rest of a longer line is skipped.
+max_id_length = 256
+
+# Tracking events per shipment in a response when no limit is asked for, and the largest limit that can be
+default_event_limit = int(os.getenv("TRACKING_EVENT_LIMIT", 100))
+max_event_limit = 1000
+
+# A position in a timeline of tracking events: (created_utc, sequence). The sequence is the order in which the events
+# were stored, and breaks the ties between events created at the same time.
+EventKey = tuple[datetime, float]
+
+def as_utc(moment: datetime) -> datetime:
+    """Naive date times are taken to be in UTC, so that they can be compared with the aware ones."""
+    return moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def event_key(since: Optional[datetime], since_sequence: Optional[int] = None) -> Optional[EventKey]:
+    """The position after which events are new to a client that has seen every event up to since. Without since_sequence,
+    that is every event created at since; with it, only the ones created at since and stored up to since_sequence."""
+    if since is None:
+        return None
+    return as_utc(since), math.inf if since_sequence is None else since_sequence
+
+def event_sequences(created: list[datetime], replaced: Optional["EventIndex"], sequence: Optional[Iterator[int]]) -> list[int]:
+    """The sequence of each of the events created at created. Events that replaced already had keep theirs, matched by
+    created_utc in the order they were stored, which assumes a source only ever adds events, and the others get the next
+    ones of sequence. All 0 without a sequence, when the ties cannot be broken."""
+    if sequence is None:
+        return [0] * len(created)
+    stored: dict[datetime, deque[int]] = {}
+    for moment, stored_sequence in (replaced.keys if replaced else []):
+        stored.setdefault(moment, deque()).append(stored_sequence)
+    return [stored[moment].popleft() if stored.get(moment) else next(sequence) for moment in created]
+
+class EventIndex:
+    """Tracking events ordered by their created_utc and sequence, to find the ones created in a time range with a binary search."""
+
+    def __init__(self, events: list[TrackingEvent], sequence: Optional[Iterator[int]] = None, replaced: Optional["EventIndex"] = None):
+        self.events = sorted(events, key=lambda event: as_utc(event.event_time.created_utc))
+        created = [as_utc(event.event_time.created_utc) for event in self.events]
+        self.keys: list[EventKey] = list(zip(created, event_sequences(created, replaced, sequence)))
+
+    @property
+    def last_updated(self) -> Optional[datetime]:
+        return self.keys[-1][0] if self.keys else None
+
+    def between(self, after: Optional[EventKey], starting: Optional[datetime], before: Optional[datetime]) -> list[TrackingEvent]:
+        """The events after after, created from starting and before before. A bound of None is left open."""
+        low = bisect_right(self.keys, after) if after else 0
+        if starting:
+            low = max(low, bisect_left(self.keys, (as_utc(starting),)))
+        high = bisect_left(self.keys, (as_utc(before),)) if before else len(self.keys)
+        return self.events[low:high]
+
+    def __contains__(self, event: TrackingEvent) -> bool:
+        """Whether an equal event is indexed, looking only at the events created at the same time."""
+        created = as_utc(event.event_time.created_utc)
+        return event in self.events[bisect_left(self.keys, (created,)):bisect_right(self.keys, (created, math.inf))]
+
+class EventPage(NamedTuple):
+    content: BaseModel
+    """The shipment or parcel with only the events of the page, and only the parcels that have any unless the page is the whole history."""
+    events: int
+    next_before: Optional[datetime]
+    """The `before` of the page with the older events, None when there are none."""
+
+def page_bounds(timeline: list[EventKey], after: Optional[EventKey], before: Optional[datetime], limit: Optional[int]) -> tuple[int, int, int]:
+    """The positions in a sorted timeline of the first event after after, of the first of the latest `limit` of them, and of the first created from before."""
+    low = bisect_right(timeline, after) if after else 0
+    high = bisect_left(timeline, (as_utc(before),)) if before else len(timeline)
+    start = low if limit is None else max(low, high - limit)
+    if low < start < high and timeline[start - 1][0] == timeline[start][0]:
+        # Events created at the same time are never split between two pages: the page ends after them, or when they
+        # fill it on their own, takes all of them
+        created = timeline[start][0]
+        after_tie = bisect_right(timeline, (created, math.inf), start, high)
+        start = after_tie if after_tie < high else bisect_left(timeline, (created,), low, start)
+    return low, start, high
+
+def is_updated(timeline: list[EventKey], after: Optional[EventKey]) -> bool:
+    return bool(timeline) and (after is None or timeline[-1] > after)
+
+class TrackedParcel:
+    """A parcel of a shipment with its events indexed by created_utc, which is tracked without its sibling parcels."""
+
+    def __init__(self, shipment_id: str, parcel: TrackingEventParcel, sequence: Optional[Iterator[int]] = None, replaced: Optional["TrackedParcel"] = None):
+        self.shipment_id = shipment_id
+        self.parcel = parcel
+        self.events = EventIndex(parcel.tracking_data.events, sequence, replaced.events if replaced else None)
+        self.last_updated = self.events.last_updated
+        self.last_sequence = max((key[1] for key in self.events.keys), default=0)
+        self._all_events = self._events(self.events.events)
+
+    @property
+    def id(self) -> str:
+        return self.parcel.id
+
+    def _events(self, events: list[TrackingEvent]) -> TrackingEventParcel:
+        return self.parcel.model_copy(update={"tracking_data": self.parcel.tracking_data.model_copy(update={"events": events})})
+
+    def between(self, after: Optional[EventKey], starting: Optional[datetime], before: Optional[datetime]) -> TrackingEventParcel:
+        if after is None and starting is None and before is None:
+            return self._all_events
+        return self._events(self.events.between(after, starting, before))
+
+    def page(self, after: Optional[EventKey] = None, before: Optional[datetime] = None, limit: Optional[int] = None) -> EventPage:
+        """The latest `limit` events after after and created before before. Every event when all three are None."""
+        keys = self.events.keys
+        low, start, high = page_bounds(keys, after, before, limit)
+        if start == 0 and high == len(keys):
+            return EventPage(self._all_events, high, None)
+        return EventPage(self._events(self.events.events[start:high]), high - start, keys[start][0] if low < start < high else None)
+
+    def updated_since(self, after: Optional[EventKey]) -> bool:
+        return is_updated(self.events.keys, after)
+
+class TrackedShipment:
+    """A shipment with the events of the shipment, and of each of its parcels, indexed by created_utc.
+
+    Pages are cut from the merged timeline of every event, so that `limit` bounds the events of the whole response. With
+    a sequence, every event is numbered in the order it was stored, keeping the numbers of the events of the shipment it
+    replaced, so that `since_sequence` can tell apart the events created at the same time.
+    """
+
+    def __init__(self, shipment: BatchTrackShipment, sequence: Optional[Iterator[int]] = None, replaced: Optional["TrackedShipment"] = None):
+        self.shipment = shipment
+        self.events = EventIndex(shipment.tracking_data.events, sequence, replaced.events if replaced else None) if shipment.tracking_data else None
+        replaced_parcels = {parcel.id: parcel for parcel in replaced.parcels} if replaced else {}
+        self.parcels = [TrackedParcel(shipment.id, parcel, sequence, replaced_parcels.get(parcel.id)) for parcel in shipment.parcels]
+        self.timeline: list[EventKey] = sorted(chain.from_iterable(index.keys for index in (self.events, *(parcel.events for parcel in self.parcels)) if index))
+        self.last_updated: Optional[datetime] = self.timeline[-1][0] if self.timeline else None
+        self.last_sequence = max((key[1] for key in self.timeline), default=0)
+        self._all_events = self._page(None, None, None)
+
+    @property
+    def id(self) -> str:
+        return self.shipment.id
+
+    def _page(self, after: Optional[EventKey], starting: Optional[datetime], before: Optional[datetime]) -> BatchTrackShipment:
+        whole_history = after is None and starting is None and before is None
+        update = {}
+        if self.events is not None:
+            update["tracking_data"] = self.shipment.tracking_data.model_copy(update={"events": self.events.between(after, starting, before)})
+        parcels = [parcel.between(after, starting, before) for parcel in self.parcels]
+        update["parcels"] = parcels if whole_history else [parcel for parcel in parcels if parcel.tracking_data.events]
+        return self.shipment.model_copy(update=update)
+
+    def page(self, after: Optional[EventKey] = None, before: Optional[datetime] = None, limit: Optional[int] = None) -> EventPage:
+        """The latest `limit` events after after and created before before. Every event when all three are None."""
+        low, start, high = page_bounds(self.timeline, after, before, limit)
+        if start == 0 and high == len(self.timeline):
+            return EventPage(self._all_events, high, None)
+        starting = self.timeline[start][0] if start < high else None
+        next_before = self.timeline[start][0] if low < start < high else None
+        return EventPage(self._page(after, starting, before), high - start, next_before)
+
+    def updated_since(self, after: Optional[EventKey]) -> bool:
+        return is_updated(self.timeline, after)
+
+class ShipmentSource(Protocol):
+    async def track(self, ids: list[str], id_type: ShipmentIdType = ShipmentIdType.SHIPMENT_ID) -> dict[str, TrackedShipment]:
+        """The tracked shipments of ids by the ID they were found with, leaving out the IDs that do not exist."""
+
+    async def track_parcels(self, ids: list[str], id_type: ParcelIdType) -> dict[str, TrackedParcel]:
+        """The tracked parcels of ids by the ID they were found with, leaving out the IDs that do not exist."""
+
+    def follow_tracking_update(self, event: TrackingWebhookEvent):
+        """Applies a tracking event received from a carrier, including any new carrier tracking ID it assigns to the
+        shipment or parcel of the event. Called by the internal route of app.api.v1.tracking.updates."""
+
+def api_tracking_event(event: TrackingWebhookEvent) -> TrackingEvent:
+    other = event.event.other
+    return TrackingEvent(
+        carrier_meta_data=event.event.carrier_meta_data,
+        event_time=event.event.event_time,
+        eta=other.eta.isoformat() if other and other.eta else None,
+        codes=event.event.codes,
+        location=event.event.location)
+
+class TrackingStore:
+    """Tracked shipments kept in memory, by their ID, and their parcels by parcel ID.
+
+    Every carrier tracking ID, of a shipment or of a parcel, is a key of a secondary index to the (shipment ID, parcel ID)
+    it belongs to. The index stores IDs rather than the tracked shipments, so it stays valid when a shipment is replaced.
+    Gluey's tracking backend calls `follow_tracking_update` for every event, through the internal route of
+    app.api.v1.tracking.updates, which adds the event and the new tracking IDs a carrier assigns to it.
+    """
+
+    def __init__(self):
+        self.shipments: dict[str, TrackedShipment] = {}
+        self.parcels: dict[str, TrackedParcel] = {}
+        self.carrier_tracking_ids: dict[str, tuple[str, Optional[str]]] = {}
+        # Numbers every stored event, see TrackedShipment
+        self.sequence = count(1)
+
+    def add(self, shipment: BatchTrackShipment):
+        replaced = self.shipments.get(shipment.id)
+        if replaced is not None:
+            for parcel in replaced.parcels:
+                if self.parcels.get(parcel.id) is parcel:
+                    del self.parcels[parcel.id]
+
+        tracked = TrackedShipment(shipment, self.sequence, replaced)
+        self.shipments[shipment.id] = tracked
+        if shipment.carrier_tracking_id:
+            self.carrier_tracking_ids[shipment.carrier_tracking_id] = (shipment.id, None)
+        for parcel in tracked.parcels:
+            self.parcels[parcel.id] = parcel
+            if parcel.parcel.carrier_tracking_id:
+                self.carrier_tracking_ids[parcel.parcel.carrier_tracking_id] = (shipment.id, parcel.id)
+
+    def rotate_carrier_tracking_id(self, carrier_tracking_id: str, new_carrier_tracking_id: str, owner: tuple[str, Optional[str]]) -> bool:
+        """Finds owner, a (shipment ID, parcel ID), with new_carrier_tracking_id as well as with carrier_tracking_id.
+
+        False, and nothing changes, when carrier_tracking_id is not a tracking ID of owner, or when
+        new_carrier_tracking_id already is the tracking ID of another shipment or parcel.
+        """
+        if self.carrier_tracking_ids.get(carrier_tracking_id) != owner:
+            return False
+        current = self.carrier_tracking_ids.get(new_carrier_tracking_id)
+        if current is not None and current != owner:
+            logger.warning("Carrier tracking ID %s of %s is not followed, it already is the tracking ID of %s", new_carrier_tracking_id, owner, current)
+            return False
+        self.carrier_tracking_ids[new_carrier_tracking_id] = owner
+        return True
+
+    def follow_tracking_update(self, event: TrackingWebhookEvent):
+        """Indexes the new carrier tracking IDs of a tracking event, of the shipment and of its parcel, and adds the event
+        to the stored shipment, or to its parcel. Events of shipments that are not stored only have their IDs indexed,
+        and an event that is already stored, e.g. from a delivery that was retried, is not added again."""
+        if event.carrier_tracking_update:
+            self.rotate_carrier_tracking_id(event.carrier_tracking_id, event.carrier_tracking_update.new_carrier_tracking_id, (event.shipment_id, None))
+        if event.parcel and event.parcel.carrier_tracking_id and event.parcel.carrier_tracking_update:
+            self.rotate_carrier_tracking_id(event.parcel.carrier_tracking_id, event.parcel.carrier_tracking_update.new_carrier_tracking_id, (event.shipment_id, event.parcel.parcel_id))
+
+        tracked = self.shipments.get(event.shipment_id)
+        if tracked is None:
+            return
+        shipment = tracked.shipment
+        tracking_event = api_tracking_event(event)
+        if event.parcel:
+            parcel = next((parcel for parcel in tracked.parcels if parcel.id == event.parcel.parcel_id), None)
+            if parcel is None or tracking_event in parcel.events:
+                return
+            parcels = [parcel.model_copy(update={"tracking_data": parcel.tracking_data.model_copy(update={"events": [*parcel.tracking_data.events, tracking_event]})})
+                       if parcel.id == event.parcel.parcel_id else parcel for parcel in shipment.parcels]
+            self.add(shipment.model_copy(update={"parcels": parcels}))
+        elif tracked.events is not None and tracking_event not in tracked.events:
+            self.add(shipment.model_copy(update={"tracking_data": shipment.tracking_data.model_copy(update={"events": [*shipment.tracking_data.events, tracking_event]})}))
+
+    async def track(self, ids: list[str], id_type: ShipmentIdType = ShipmentIdType.SHIPMENT_ID) -> dict[str, TrackedShipment]:
+        if id_type == ShipmentIdType.CARRIER_TRACKING_ID:
+            owners = {id: self.carrier_tracking_ids[id] for id in ids if id in self.carrier_tracking_ids}
+            return {id: self.shipments[shipment_id] for id, (shipment_id, _) in owners.items() if shipment_id in self.shipments}
+        return {id: self.shipments[id] for id in ids if id in self.shipments}
+
+    async def track_parcels(self, ids: list[str], id_type: ParcelIdType) -> dict[str, TrackedParcel]:
+        if id_type == ParcelIdType.CARRIER_TRACKING_ID:
+            owners = {id: self.carrier_tracking_ids[id] for id in ids if id in self.carrier_tracking_ids}
+            return {id: self.parcels[parcel_id] for id, (_, parcel_id) in owners.items() if parcel_id in self.parcels}
+        return {id: self.parcels[id] for id in ids if id in self.parcels}
+
+def batches(ids: Iterable[str], size: int) -> Iterator[list[str]]:
+    ids = iter(ids)
+    while batch := list(islice(ids, size)):
+        yield batch
+
+def uploaded_ids(file: IO[bytes]) -> Iterator[str]:
+    """The shipment IDs of a text/plain upload, one per line. Blank lines are skipped."""
+    while line := file.readline(max_id_length + 1):
+        if len(line) > max_id_length and not line.endswith(b"\n"):
+            while (rest := file.readline(max_id_length + 1)) and not rest.endswith(b"\n"):
+                pass
+        id = line[:max_id_length].decode("utf-8", errors="replace").strip()
+        if id:
+            yield id
+
+class ShipmentTracker:
+    """Tracks shipments from a ShipmentSource.
+
+    A stream of IDs is looked up in batches, with at most `concurrency` batches in flight, and the lines are yielded in
+    the order of the IDs one batch at a time, so memory stays bounded however many IDs are tracked.
+    """
+
+    def __init__(self, source: ShipmentSource, batch_size: int = 100, concurrency: int = 4):
+        self.source = source
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    async def shipment(self, id: str, id_type: ShipmentIdType = ShipmentIdType.SHIPMENT_ID) -> Optional[TrackedShipment]:
+        return (await self.source.track([id], id_type)).get(id)
+
+    async def shipments(self, ids: list[str], id_type: ShipmentIdType = ShipmentIdType.SHIPMENT_ID) -> list[TrackedShipment]:
+        """The tracked shipments of ids that exist, in the order of ids."""
+        tracked = await self.source.track(ids, id_type)
+        return [tracked[id] for id in ids if id in tracked]
+
+    async def parcel(self, shipment_id: str, parcel_id: str) -> Optional[TrackedParcel]:
+        parcel = (await self.source.track_parcels([parcel_id], ParcelIdType.PARCEL_ID)).get(parcel_id)
+        return parcel if parcel is not None and parcel.shipment_id == shipment_id else None
+
+    async def parcels(self, ids: list[str], id_type: ParcelIdType) -> list[tuple[str, TrackedParcel]]:
+        """The IDs of the tracked parcels of ids that exist, with the parcels, in the order of ids."""
+        tracked = await self.source.track_parcels(ids, id_type)
+        return [(id, tracked[id]) for id in ids if id in tracked]
+
+    def _lines(self, cursor: int, ids: list[str], shipments: dict[str, TrackedShipment], after: Optional[EventKey], limit: Optional[int]) -> bytes:
+        lines = []
+        for id in ids:
+            cursor += 1
+            tracked = shipments.get(id)
+            if tracked is None:
+                line = BatchTrackStreamLine(cursor=cursor, id=id, detail="Shipment not found.")
+            else:
+                page = tracked.page(after, limit=limit)
+                line = BatchTrackStreamLine(cursor=cursor, id=id, last_updated=tracked.last_updated, last_sequence=tracked.last_sequence, next_before=page.next_before, shipment=page.content)
+            lines.append(pydantic_core.to_json(line) + b"\n")
+        return b"".join(lines)
+
+    async def stream(self, ids: Iterable[str], cursor: int = 0, after: Optional[EventKey] = None, limit: Optional[int] = None, id_type: ShipmentIdType = ShipmentIdType.SHIPMENT_ID, blocking_ids: bool = False) -> AsyncIterator[bytes]:
+        """One chunk of lines per batch of ids, skipping the first `cursor` IDs that were answered before.
+
+        Every shipment only has its latest `limit` events, and with after only the ones after it. With blocking_ids,
+        e.g. IDs read from an uploaded file, each batch is read in the threadpool so the event loop never waits for the disk.
+        """
+        in_flight: deque[tuple[int, list[str], asyncio.Future]] = deque()
+        position = cursor
+        id_batches = batches(islice(ids, cursor, None), self.batch_size)
+        try:
+            while batch := (await run_in_threadpool(next, id_batches, None) if blocking_ids else next(id_batches, None)):
+                in_flight.append((position, batch, asyncio.ensure_future(self.source.track(batch, id_type))))
+                position += len(batch)
+                if len(in_flight) >= self.concurrency:
+                    start, batch_ids, lookup = in_flight.popleft()
+                    yield self._lines(start, batch_ids, await lookup, after, limit)
+            while in_flight:
+                start, batch_ids, lookup = in_flight.popleft()
+                yield self._lines(start, batch_ids, await lookup, after, limit)
+        finally:
+            # The client went away, or a lookup failed
+            for _, _, lookup in in_flight:
+                lookup.cancel()
+
+tracker = ShipmentTracker(
+    TrackingStore(),
+    batch_size=int(os.getenv("TRACK_STREAM_BATCH_SIZE", 100)),
+    concurrency=int(os.getenv("TRACK_STREAM_CONCURRENCY", 4)),
+)
+
+def configure_shipment_source(source: ShipmentSource):
+    """Reads tracked shipments from source from now on."""
+    tracker.source = source
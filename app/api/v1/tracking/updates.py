@@ -0,0 +1,33 @@
+"""The internal route through which Gluey's tracking backend feeds tracking events to the tracking endpoints.
+
+It is not part of the public API: it is left out of every OpenAPI schema, and answers 404 unless TRACKING_UPDATES_TOKEN
+is configured and sent in the x-internal-token header. POST /webhook/tracking only documents the webhook that customers
+receive, and changes nothing.
+"""
+import hmac
+import os
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.api.v1.common.routing import RawBodyRoute
+from app.api.v1.tracking.models.webhooks.tracking_event import TrackingWebhookEvent
+from app.api.v1.tracking.store import tracker
+
+updates_token = os.getenv("TRACKING_UPDATES_TOKEN")
+
+def updates_authorized(token: str | None) -> bool:
+    return bool(updates_token) and token is not None and hmac.compare_digest(token, updates_token)
+
+async def internal_token(x_internal_token: Annotated[Optional[str], Header()] = None):
+    # A dependency, so an unauthorized request is answered before its body is validated
+    if not updates_authorized(x_internal_token):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+updates_router = APIRouter(route_class=RawBodyRoute)
+
+@updates_router.post("/internal/tracking/events", include_in_schema=False, status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(internal_token)])
+async def receive_tracking_events(payload: list[TrackingWebhookEvent]):
+    # Keeps the tracking endpoints current, including lookups by a carrier tracking ID the carrier has replaced
+    for event in payload:
+        tracker.source.follow_tracking_update(event)
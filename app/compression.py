@@ -0,0 +1,133 @@
+import gzip
+import os
+import zlib
+from collections.abc import AsyncIterator
+
+import brotli
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from app.http_cache import accepted_encodings, cache_group
+from app.metrics import record_cache
+
+# Bodies are compressed when their content type starts with one of these
+compressible_types = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml", "image/svg+xml")
+
+# Groups from app.http_cache whose body never changes for a given ETag, so each encoding is compressed once
+deterministic_groups = ("static", "specs", "event_codes")
+
+# Bodies of other responses are only compressed from this many bytes, below that compression costs more than it saves
+minimum_size = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+
+# (brotli quality, gzip level) for bodies compressed once and cached, and for bodies compressed on every request
+cached_quality = (11, 9)
+dynamic_quality = (4, 6)
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    accepted = accepted_encodings(accept_encoding)
+    return next((encoding for encoding in ("br", "gzip") if encoding in accepted), "identity")
+
+def compress(body: bytes, encoding: str, quality: tuple[int, int] = cached_quality) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=quality[0])
+    return gzip.compress(body, compresslevel=quality[1], mtime=0)
+
+class StreamCompressor:
+    """Compresses a body chunk by chunk, so streamed exports are never buffered before they are sent."""
+
+    def __init__(self, encoding: str, quality: tuple[int, int]):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=quality[0])
+            self._compress = self._compressor.process
+            self._flush = self._compressor.finish
+        else:
+            # wbits 31 writes the gzip header and trailer, with mtime 0 as in compress()
+            self._compressor = zlib.compressobj(quality[1], zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+            self._flush = self._compressor.flush
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compress(chunk)
+
+    def flush(self) -> bytes:
+        return self._flush()
+
+class CompressedBodyCache:
+    """Compressed bodies of deterministic responses, keyed by (path, ETag, encoding)."""
+
+    # Entries kept before the cache is emptied, a new ETag per data revision would otherwise grow it forever
+    max_entries = 256
+
+    def __init__(self):
+        self._bodies: dict[tuple[str, str, str], bytes] = {}
+
+    def get(self, key: tuple[str, str, str]) -> bytes | None:
+        return self._bodies.get(key)
+
+    def set(self, key: tuple[str, str, str], body: bytes):
+        if len(self._bodies) >= self.max_entries:
+            self._bodies.clear()
+        self._bodies[key] = body
+
+    def clear(self):
+        self._bodies.clear()
+
+compressed_bodies = CompressedBodyCache()
+
+def encoded_headers(response: Response, encoding: str) -> MutableHeaders:
+    headers = MutableHeaders(raw=[(name, value) for name, value in response.headers.raw if name != b"content-length"])
+    headers["content-encoding"] = encoding
+    etag = response.headers.get("etag")
+    if etag is not None:
+        # Each encoding is a different representation, so it needs its own strong ETag
+        headers["etag"] = f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else f"{etag}-{encoding}"
+    return headers
+
+async def compressed_chunks(body_iterator: AsyncIterator[bytes], compressor: StreamCompressor, on_complete=None) -> AsyncIterator[bytes]:
+    compressed = []
+    async for chunk in body_iterator:
+        output = compressor.compress(chunk)
+        if output:
+            compressed.append(output)
+            yield output
+    output = compressor.flush()
+    compressed.append(output)
+    yield output
+    if on_complete is not None:
+        on_complete(b"".join(compressed))
+
+async def compress_response(request: Request, response: Response) -> Response:
+    """The response in the best encoding the client accepts. Responses that are already encoded are returned as they are."""
+    content_type = response.headers.get("content-type", "")
+    if request.method != "GET" or response.status_code != 200 or "content-encoding" in response.headers or not content_type.startswith(compressible_types):
+        return response
+
+    vary = response.headers.get("vary")
+    if vary is None:
+        response.headers["vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        response.headers["vary"] = f"{vary}, Accept-Encoding"
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding == "identity" or int(response.headers.get("content-length", minimum_size)) < minimum_size:
+        return response
+
+    headers = encoded_headers(response, encoding)
+    etag = response.headers.get("etag")
+    group = cache_group(request.url.path, content_type)
+    if etag is not None and group in deterministic_groups:
+        key = (request.url.path, etag, encoding)
+        cached = compressed_bodies.get(key)
+        record_cache(f"compressed_{group}", hit=cached is not None)
+        if cached is not None:
+            return Response(content=cached, status_code=response.status_code, headers=dict(headers))
+        compressor = StreamCompressor(encoding, cached_quality)
+        return StreamingResponse(compressed_chunks(response.body_iterator, compressor, lambda body: compressed_bodies.set(key, body)), status_code=response.status_code, headers=dict(headers))
+
+    if "content-length" in response.headers:
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        return Response(content=compress(body, encoding, dynamic_quality), status_code=response.status_code, headers=dict(headers))
+
+    # A streamed body of unknown size is assumed to be worth compressing
+    return StreamingResponse(compressed_chunks(response.body_iterator, StreamCompressor(encoding, dynamic_quality)), status_code=response.status_code, headers=dict(headers))
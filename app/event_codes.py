@@ -0,0 +1,259 @@
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+import csv
+import hashlib
+import io
+from itertools import chain
+import json
+import logging
+import os
+from threading import Lock
+import time
+
+from app.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+csv_files = {
+    "all_events": "./app/static/all_events.csv",
+    "outbound": "./app/static/outbound.csv",
+    "return": "./app/static/return.csv",
+    "international": "./app/static/international.csv",
+    "exceptions": "./app/static/exceptions.csv",
+}
+
+csv_files_v2 = {
+    "all_events": "./app/static/all_events_v2.csv",
+}
+
+# The /json and /csv exports of these views also include the international and exception codes
+combined_views = {
+    "outbound": ["outbound", "international", "exceptions"],
+    "return": ["return", "international", "exceptions"],
+}
+
+class EventCodeView:
+    """The event codes of one CSV file, or of several combined, with the indexes used by the docs routes.
+
+    A (milestone, code, sub_code) that is listed more than once keeps its first row, in the indexes and in the exports.
+    """
+
+    def __init__(self, name: str, header: list[str], rows: list[list[str]]):
+        self.name = name
+        self.header = header
+        self.rows = []
+        self.events: list[dict] = []
+        self.by_milestone: dict[str, list[dict]] = defaultdict(list)
+        self.by_code: dict[str, list[dict]] = defaultdict(list)
+        self.by_sub_code: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        self.by_event: dict[tuple[str, str, str], dict] = {}
+        self.tree = defaultdict(lambda: defaultdict(dict))
+
+        columns = [header.index(column) for column in ("milestone", "code", "sub_code", "detailed_explanation")]
+        for row in rows:
+            milestone, code, sub_code, explanation = (row[column] for column in columns)
+            event = {
+                "milestone": milestone,
+                "code": code,
+                "sub_code": sub_code or "No Sub Event",
+                "description": explanation
+            }
+            if (milestone, code, sub_code) in self.by_event:
+                continue
+            self.rows.append(row)
+            self.events.append(event)
+            self.by_milestone[milestone].append(event)
+            self.by_code[code].append(event)
+            self.by_sub_code[(code, sub_code)].append(event)
+            self.by_event[(milestone, code, sub_code)] = event
+            self.tree[milestone][code][event["sub_code"]] = explanation
+
+# Encoded output is buffered up to this many bytes before a chunk is yielded, which bounds the memory of an export
+chunk_size = 64 * 1024
+
+def chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        encoded = piece.encode("utf-8")
+        buffer.append(encoded)
+        buffered += len(encoded)
+        if buffered >= chunk_size:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+def csv_lines(view: EventCodeView) -> Iterator[str]:
+    line = io.StringIO()
+    writer = csv.writer(line)
+    for row in chain([view.header], view.rows):
+        writer.writerow(row)
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+
+def json_items(view: EventCodeView) -> Iterator[str]:
+    yield "["
+    for index, event in enumerate(view.events):
+        yield ("," if index else "") + json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+    yield "]"
+
+def ndjson_lines(view: EventCodeView) -> Iterator[str]:
+    for event in view.events:
+        yield json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+def stream_csv(view: EventCodeView) -> Iterator[bytes]:
+    return chunked(csv_lines(view))
+
+def stream_json(view: EventCodeView) -> Iterator[bytes]:
+    return chunked(json_items(view))
+
+def stream_ndjson(view: EventCodeView) -> Iterator[bytes]:
+    return chunked(ndjson_lines(view))
+
+# Codes that were renamed or moved to another milestone between two catalogue versions. A (milestone, code) key keeps
+# the sub code, a (milestone, code, sub_code) key maps that one event code.
+code_renames = {
+    ("v1", "v2"): {
+        ("start", "start", "gluey_test"): ("order", "created", "gluey_test"),
+        ("start", "order_created"): ("order", "created"),
+        ("start", "order_cancelled"): ("order", "cancelled"),
+        ("collection", "pick_pack"): ("order", "pick_pack"),
+        ("collection", "despatch"): ("order", "despatched"),
+        ("in_transit", "carrier"): ("in_transit", "carrier_network"),
+        ("return_centre", "inspection", "started"): ("return_centre", "inspection_started", ""),
+        ("return_centre", "inspection", "approved"): ("return_centre", "inspection_approved", ""),
+        ("return_centre", "inspection", "faulty_items_missing"): ("return_centre", "inspection_failed", "items_missing"),
+        ("return_centre", "inspection", "faulty_items_damaged"): ("return_centre", "inspection_failed", "items_damaged"),
+        ("return_centre", "inspection", "faulty_wrong_items"): ("return_centre", "inspection_failed", "wrong_items"),
+        ("return_centre", "inspection", "faulty_empty"): ("return_centre", "inspection_failed", "empty_parcel"),
+        ("return_centre", "inspection", "faulty_unknown_objects"): ("return_centre", "inspection_failed", "unknown_objects"),
+        ("return_centre", "inspection", "faulty_other"): ("return_centre", "inspection_failed", "other"),
+    }
+}
+
+def map_event_code(key: tuple[str, str, str], description: str, to_view: EventCodeView, renames: dict, to_descriptions: dict) -> tuple[tuple[str, str, str] | None, str | None]:
+    """The event code in to_view that key maps to, and how it was matched: same, renamed, description or parent."""
+    if key in to_view.by_event:
+        return key, "same"
+
+    milestone, code, sub_code = key
+    renamed = renames.get(key)
+    if renamed is None and (milestone, code) in renames:
+        renamed = (*renames[(milestone, code)], sub_code)
+    if renamed in to_view.by_event:
+        return renamed, "renamed"
+
+    same_description = to_descriptions.get(description.strip().lower())
+    if same_description:
+        return same_description, "description"
+
+    # Fall back to the code without a sub code, e.g. ('collection', 'collected', 'other') -> ('collection', 'collected', '')
+    parent = (*(renamed or key)[:2], "")
+    if parent in to_view.by_event:
+        return parent, "parent"
+    return None, None
+
+def as_event_code(key: tuple[str, str, str]) -> dict:
+    return {"milestone": key[0], "code": key[1], "sub_code": key[2]}
+
+def diff_views(from_version: str, from_view: EventCodeView, to_version: str, to_view: EventCodeView) -> dict:
+    renames = code_renames.get((from_version, to_version), {})
+    to_descriptions = {}
+    for key, event in to_view.by_event.items():
+        to_descriptions.setdefault(event["description"].strip().lower(), key)
+
+    mapping = []
+    for key, event in from_view.by_event.items():
+        target, match = map_event_code(key, event["description"], to_view, renames, to_descriptions)
+        mapping.append({"from_code": as_event_code(key), "to_code": as_event_code(target) if target else None, "match": match})
+
+    return {
+        "from_version": from_version,
+        "to_version": to_version,
+        "added_milestones": [milestone for milestone in to_view.by_milestone if milestone not in from_view.by_milestone],
+        "removed_milestones": [milestone for milestone in from_view.by_milestone if milestone not in to_view.by_milestone],
+        "added": [as_event_code(key) for key in to_view.by_event if key not in from_view.by_event],
+        "removed": [as_event_code(key) for key in from_view.by_event if key not in to_view.by_event],
+        "changed": [as_event_code(key) for key, event in from_view.by_event.items() if key in to_view.by_event and to_view.by_event[key]["description"] != event["description"]],
+        "mapping": mapping,
+    }
+
+class EventCodeCatalogue:
+    """All tracking event codes of one catalogue version, parsed once from the CSVs in app/static and re-loaded when one of the files' mtime changes.
+
+    When a changed file cannot be parsed, the error is logged and the previous catalogue is served until the files change again.
+    """
+
+    # Seconds between checks of the files' mtimes
+    check_interval = 1.0
+
+    def __init__(self, version: str = "v1", files: dict[str, str] = csv_files, combined: dict[str, list[str]] = combined_views):
+        self.version = version
+        self.files = files
+        self.combined = combined
+        self.file_views: dict[str, EventCodeView] = {}
+        self.export_views: dict[str, EventCodeView] = {}
+        self.revision = ""
+        self._mtimes = None
+        self._failed_mtimes = None
+        self._checked = 0.0
+        self._lock = Lock()
+
+    def _load(self, mtimes: tuple[int, ...]):
+        header = None
+        file_rows = {}
+        for name, path in self.files.items():
+            with open(path, newline='', encoding='utf-8') as csvfile:
+                reader = csv.reader(csvfile)
+                file_header = next(reader)
+                header = header or file_header
+                file_rows[name] = list(reader)
+
+        file_views = {name: EventCodeView(name, header, rows) for name, rows in file_rows.items()}
+        export_views = dict(file_views)
+        for name, parts in self.combined.items():
+            export_views[name] = EventCodeView(name, header, [row for part in parts for row in file_rows[part]])
+
+        self.file_views = file_views
+        self.export_views = export_views
+        self.revision = hashlib.sha256(repr(mtimes).encode()).hexdigest()[:16]
+        self._mtimes = mtimes
+
+    def refresh(self):
+        now = time.monotonic()
+        if self._mtimes is not None and now - self._checked < self.check_interval:
+            return
+
+        with self._lock:
+            self._checked = now
+            mtimes = tuple(os.stat(path).st_mtime_ns for path in self.files.values())
+            # A miss is a (re)load of the CSV files
+            record_cache(f"event_codes_{self.version}", hit=mtimes == self._mtimes)
+            if mtimes != self._mtimes and mtimes != self._failed_mtimes:
+                try:
+                    self._load(mtimes)
+                except (OSError, ValueError, IndexError, StopIteration, csv.Error):
+                    if self._mtimes is None:
+                        raise
+                    # An edit that cannot be parsed keeps the previous catalogue until the files change again
+                    logger.exception("Event codes %s could not be reloaded, still serving revision %s", self.version, self.revision)
+                    self._failed_mtimes = mtimes
+
+    def file_view(self, name: str) -> EventCodeView:
+        self.refresh()
+        return self.file_views[name]
+
+    def export_view(self, name: str) -> EventCodeView:
+        """The view served on /json/{name} and /csv/{name}, which for outbound and return is combined with other files."""
+        self.refresh()
+        return self.export_views[name]
+
+event_codes = EventCodeCatalogue()
+
+catalogues = {
+    "v1": event_codes,
+    "v2": EventCodeCatalogue("v2", csv_files_v2, {}),
+}
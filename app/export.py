@@ -0,0 +1,90 @@
+"""Render every documentation route into a directory of static files that a CDN or nginx can serve without Python.
+
+    python -m app.export --output ./site
+
+HTML pages are written as `<route>/index.html`, every other route to its exact URL path, and every file gets
+precompressed `.gz` and `.br` siblings. `headers.json` maps each URL path to the headers it must be served with.
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+
+import brotli
+from fastapi.testclient import TestClient
+from starlette.routing import Route
+
+from app.main import app, csv_files, openapi_schemas, webhook_openapi_schemas
+
+path_parameters = {
+    "/json/{file_name}": list(csv_files),
+    "/csv/{file_name}": list(csv_files),
+    "/openapi-{schema_type}.json": list(openapi_schemas),
+    "/openapiwebhook-{schema_type}.json": list(webhook_openapi_schemas),
+}
+
+exported_headers = ["content-type", "content-disposition"]
+
+# Operational routes that are not part of the documentation site
+excluded_prefixes = ("/metrics", "/debug/")
+
+def export_paths() -> list[str]:
+    """All GET paths of the documentation site, i.e. the routes that are not part of the API schema."""
+    paths = []
+    for route in app.routes:
+        if not isinstance(route, Route) or route.include_in_schema or "GET" not in route.methods or route.path.startswith(excluded_prefixes):
+            continue
+        if not route.param_convertors:
+            paths.append(route.path)
+            continue
+        parameter = next(iter(route.param_convertors))
+        paths.extend(route.path.replace(f"{{{parameter}}}", value) for value in path_parameters[route.path])
+    return paths
+
+def file_path(path: str, content_type: str) -> str:
+    if content_type.startswith("text/html"):
+        return os.path.join(path.strip("/"), "index.html")
+    return path.lstrip("/")
+
+def write_file(output: str, relative_path: str, body: bytes):
+    target = os.path.join(output, relative_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(body)
+    with open(f"{target}.gz", "wb") as f:
+        f.write(gzip.compress(body, compresslevel=9, mtime=0))
+    with open(f"{target}.br", "wb") as f:
+        f.write(brotli.compress(body, quality=11))
+
+def export_site(output: str) -> dict[str, dict[str, str]]:
+    client = TestClient(app)
+    headers = {}
+
+    for path in export_paths():
+        response = client.get(path)
+        response.raise_for_status()
+        write_file(output, file_path(path, response.headers["content-type"]), response.content)
+        headers[path] = {name: response.headers[name] for name in exported_headers if name in response.headers}
+
+    static_directory = "./app/static"
+    for static_file in sorted(os.listdir(static_directory)):
+        with open(os.path.join(static_directory, static_file), "rb") as f:
+            write_file(output, os.path.join("static", static_file), f.read())
+
+    with open(os.path.join(output, "headers.json"), "w", encoding="utf-8") as f:
+        json.dump(headers, f, indent=2)
+
+    return headers
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the documentation site as static files.")
+    parser.add_argument("--output", default="./site", help="Directory to write the site to. Replaced if it exists.")
+    args = parser.parse_args()
+
+    shutil.rmtree(args.output, ignore_errors=True)
+    headers = export_site(args.output)
+    print(f"Exported {len(headers)} routes to {args.output}")
+
+if __name__ == "__main__":
+    main()
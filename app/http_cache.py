@@ -0,0 +1,77 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import hashlib
+import os
+
+# group: (path prefixes, default max-age in seconds). Override with e.g. CACHE_MAX_AGE_SPECS=600.
+# Responses that match no prefix are only cached when they are HTML pages.
+cache_groups = {
+    "static": (("/static/",), 86400),
+    "specs": (("/openapi-", "/openapiwebhook-"), 3600),
+    "event_codes": (("/json/", "/csv/", "/tracking-codes", "/event-codes/"), 3600),
+    "pages": ((), 300),
+}
+
+cache_max_age = {group: int(os.getenv(f"CACHE_MAX_AGE_{group.upper()}", default)) for group, (_, default) in cache_groups.items()}
+
+def cache_group(path: str, content_type: str) -> str | None:
+    for group, (prefixes, _) in cache_groups.items():
+        if path.startswith(prefixes):
+            return group
+    if content_type.startswith("text/html"):
+        return "pages"
+    return None
+
+def strong_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+def is_not_modified(request_headers, etag: str, last_modified_header: str | None) -> bool:
+    """Evaluates If-None-Match, falling back to If-Modified-Since only when no If-None-Match is sent (RFC 9110 13.2.2)."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified_header:
+        try:
+            return parsedate_to_datetime(last_modified_header) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def http_date(value: str | None) -> datetime | None:
+    """The date of a header such as If-Modified-Since, in UTC when it has no zone. None when it is missing or invalid."""
+    if not value:
+        return None
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def modified_since(if_modified_since: str | None, last_modified: datetime) -> bool:
+    """Whether last_modified is later than an If-Modified-Since date, which only has a resolution of seconds. True when the header is missing or invalid."""
+    since = http_date(if_modified_since)
+    return since is None or last_modified.replace(microsecond=0) > since
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """The content codings of an Accept-Encoding header that are not refused with q=0."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        if coding:
+            accepted.add(coding.strip())
+    return accepted
@@ -1,31 +1,35 @@
-from collections import defaultdict
-import csv
-import io
-import json
+from contextlib import asynccontextmanager
+import hashlib
+import time
 
 from fastapi import FastAPI
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.utils import get_openapi
-from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
 
-import markdown
-from markdown.extensions.codehilite import CodeHiliteExtension
-from markdown.extensions.extra import ExtraExtension
-from markdown.extensions.toc import TocExtension
-from app.api.v1.templates.MermaidExtension import MermaidExtension
+from app.api.v1.templates.markdown_pages import markdown_pages
+from app.compression import compress_response
+from app.event_codes import catalogues, csv_files, event_codes, stream_csv, stream_json, stream_ndjson
+from app.page_cache import page_cache
+from app.templating import templates
+from app.http_cache import cache_group, cache_max_age, is_not_modified, strong_etag
+from app.metrics import measured_response, metrics_response, record_cache, route_label
+from app.profiling import SlowRequestProfileMiddleware, debug_authorized, profiler
+from app.responses import dumps, json_response_class
 
 from app.api.v1.label.endpoints import router as labels_documents_router
 from app.api.v1.manifest.endpoints import router as manifest_router
 from app.api.v1.pudo.endpoints import router as pudo_router
 from app.api.v1.tracking.endpoints import router as tracking_router
+from app.api.v1.tracking.event_codes import router as event_codes_router
 
 from app.api.v1.label.webhooks import webhook_router as label_webhook_router
 from app.api.v1.label.webhooks import webhook_subscription_router as label_webhook_subscription_router
 
 from app.api.v1.tracking.webhooks import webhook_router as tracking_webhook_router
 from app.api.v1.tracking.webhooks import webhook_subscription_router as tracking_webhook_subscription_router
+from app.api.v1.tracking.updates import updates_router as tracking_updates_router
 
 servers = [
     {
@@ -40,33 +44,83 @@ servers = [
 
 github_base = "https://github.com/Gluey-AI/gluey-api-docs/tree/master/app/api/v1/"
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for catalogue in catalogues.values():
+        catalogue.refresh()
+    yield
+
 app = FastAPI(
     title="Gluey API",
-    description="API endpoints for Gluey"
+    description="API endpoints for Gluey",
+    default_response_class=json_response_class,
+    lifespan=lifespan
 )
 
 app.include_router(labels_documents_router)
 app.include_router(manifest_router)
 app.include_router(tracking_router)
 app.include_router(pudo_router)
+app.include_router(event_codes_router)
 
 app.include_router(label_webhook_router)
 app.include_router(label_webhook_subscription_router)
 
 app.include_router(tracking_webhook_router)
 app.include_router(tracking_webhook_subscription_router)
-
-templates = Jinja2Templates(directory="app/api/v1/templates")
+app.include_router(tracking_updates_router)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
+# Headers a 304 repeats from the 200 it stands for (RFC 9110 15.4.5), so caches keep their stored response consistent
+not_modified_headers = ("cache-control", "content-location", "etag", "expires", "last-modified", "vary")
+
+async def add_cache_validators(request: Request, response: Response) -> Response:
+    if request.method not in ("GET", "HEAD") or response.status_code not in (200, 304):
+        return response
+
+    group = cache_group(request.url.path, response.headers.get("content-type", ""))
+    if group is None:
+        return response
+    response.headers["cache-control"] = f"public, max-age={cache_max_age[group]}"
+    if response.status_code == 304:
+        return response
+
+    etag = response.headers.get("etag")
+    if etag is None and "content-length" in response.headers:
+        # Only bodies of a known size are hashed here, streamed bodies are never buffered and need to set their own ETag
+        body = b"".join([chunk async for chunk in response.body_iterator]) if hasattr(response, "body_iterator") else response.body
+        etag = strong_etag(body)
+        response = Response(content=body, status_code=response.status_code, headers=dict(response.headers))
+        response.headers["etag"] = etag
+    if etag is None:
+        return response
+
+    # Last-Modified is only sent when the route knows it, e.g. from a file's mtime, otherwise clients revalidate with the ETag
+    if is_not_modified(request.headers, etag, response.headers.get("last-modified")):
+        return Response(status_code=304, headers={name: response.headers[name] for name in not_modified_headers if name in response.headers})
+    return response
+
 @app.middleware("http")
-async def add_gluey_server(request: Request, call_next):
-    # header 'server' is removed in Uvicorn by flag --no-server-header
+async def finish_response(request: Request, call_next):
+    # Every step runs in this one middleware, each BaseHTTPMiddleware layer adds a task and a body stream to every request
+    started = time.perf_counter()
     response = await call_next(request)
+    response = await compress_response(request, response)
+    response = await add_cache_validators(request, response)
+
+    # header 'server' is removed in Uvicorn by flag --no-server-header
     response.headers["server"] = "gluey"
-        
-    return response
+
+    # Set here rather than on the dependency's response, which is discarded when a route returns its own Response
+    limit = getattr(request.state, "rate_limit", None)
+    if limit is not None:
+        response.headers.update(limit.headers())
+
+    return measured_response(response, request.method, route_label(request), started)
+
+if profiler.enabled:
+    app.add_middleware(SlowRequestProfileMiddleware)
 
 def get_openapi_schema(openapi_title: str, openapi_desc:str, doc_path:str, routes: any, webhooks: any = None):
     contact = {
@@ -87,6 +141,33 @@ def get_openapi_schema(openapi_title: str, openapi_desc:str, doc_path:str, route
 
     return openapi_schema
 
+# Each schema is only generated on first request, see get_cached_openapi
+openapi_schemas = {
+    "label": lambda: get_openapi_schema("Label API", "API endpoints to create shipments and print labels in Gluey.", "label", labels_documents_router.routes),
+    "manifest": lambda: get_openapi_schema("Manifest API", "API endpoints to manifest shipments in Gluey.", "manifest", manifest_router.routes),
+    "tracking": lambda: get_openapi_schema("Tracking API", "API endpoints to track shipments and look up tracking event codes in Gluey.", "tracking", tracking_router.routes + event_codes_router.routes),
+    "pudo": lambda: get_openapi_schema("PUDO API", "API endpoints to get PUDO locations in Gluey.", "pudo", pudo_router.routes),
+}
+
+webhook_openapi_schemas = {
+    "label": lambda: get_openapi_schema("Shipment Webhook", "Webhook to subscribe to, and receive, updates to a Shipment.", "label", label_webhook_subscription_router.routes, label_webhook_router.routes),
+    "tracking": lambda: get_openapi_schema("Tracking Webhook", "Webhooks to subscribe to, and receive, tracking events for a shipment.", "tracking", tracking_webhook_subscription_router.routes, tracking_webhook_router.routes),
+}
+
+openapi_cache = {}
+
+def get_cached_openapi(schema_key: str, build_schema) -> tuple[bytes, str]:
+    """The serialized schema and its strong ETag. The routers never change at runtime, so each schema is built once per process."""
+    record_cache("openapi", hit=schema_key in openapi_cache)
+    if schema_key not in openapi_cache:
+        body = dumps(build_schema())
+        openapi_cache[schema_key] = (body, f'"{hashlib.sha256(body).hexdigest()}"')
+    return openapi_cache[schema_key]
+
+def openapi_response(schema_key: str, build_schema) -> Response:
+    body, etag = get_cached_openapi(schema_key, build_schema)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 milestone_icons = {
     "start": "circle-plus",
     "collection": "truck-ramp-box",
@@ -100,91 +181,17 @@ milestone_icons = {
     "customs": "hand",
 }
 
-csv_files = {
-    "all_events": "./app/static/all_events.csv",
-    "outbound": "./app/static/outbound.csv",
-    "return": "./app/static/return.csv",
-    "international": "./app/static/international.csv",
-    "exceptions": "./app/static/exceptions.csv",
-}
-
-def read_csv_stream_for_json(file_like):
-    data = []
-    file_like.seek(0)
-    reader = csv.DictReader(file_like)
-    for row in reader:
-        data.append({
-            "milestone": row['milestone'],
-            "code": row['code'],
-            "sub_code": row['sub_code'] or "No Sub Event",
-            "description": row['detailed_explanation']
-        })
-    return data
-
-def read_csv_for_json(file_path: str):
-    data = []
-    with open(file_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            data.append({
-                "milestone": row['milestone'],
-                "code": row['code'],
-                "sub_code": row['sub_code'] or "No Sub Event",
-                "description": row['detailed_explanation']
-            })
-    return data
-
-def read_csv(file_path: str):
-    data = defaultdict(lambda: defaultdict(dict))
-    with open(file_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            milestone = row['milestone']
-            code = row['code']
-            sub_code = row['sub_code'] or "No Sub Event"
-            explanation = row['detailed_explanation']
-            data[milestone][code][sub_code] = explanation
-    return data
-
-def combine_csv_files_in_memory(primary_file: str, international_file: str, exception_file: str):
-    output = io.StringIO()
-    primary_reader = csv.reader(open(primary_file, 'r', newline='', encoding='utf-8'))
-    international_reader = csv.reader(open(international_file, 'r', newline='', encoding='utf-8'))
-    exception_reader = csv.reader(open(exception_file, 'r', newline='', encoding='utf-8'))
-    combined_writer = csv.writer(output)
-
-    header = next(primary_reader)
-    combined_writer.writerow(header)
-
-    for row in primary_reader:
-        combined_writer.writerow(row)
-
-    next(international_reader)
-    next(exception_reader)
-
-    for row in international_reader:
-        combined_writer.writerow(row)
-
-    for row in exception_reader:
-        combined_writer.writerow(row)
-
-    output.seek(0)
-    return output
-
 def __create_template(request: Request, markdown_file: str, title: str):
-    with open(f"./app/api/v1/templates/markdown/{markdown_file}", "r") as md_file:
-        md_content = md_file.read()
-    html_content = markdown.markdown(md_content, extensions=[
-        MermaidExtension(),
-        CodeHiliteExtension(linenums=False, guess_lang=False, use_pygments=True, pygments_formatter="html", css_class="highlight"),
-        ExtraExtension(),
-        TocExtension(toc_depth="2-3")])
-    
-    return templates.TemplateResponse("markdown.html", {"request": request, "markdown_content": html_content, "title": "Getting Started"})
+    html_content = markdown_pages.get(markdown_file)
+    # Already loaded by the markdown pipeline, which imports the Mermaid extension
+    from app.api.v1.templates.MermaidExtension import mermaid_js_integrity, mermaid_js_src
+
+    return templates.TemplateResponse("markdown.html", {"request": request, "markdown_content": html_content, "title": "Getting Started",
+                                                        "mermaid_js_src": mermaid_js_src(), "mermaid_js_integrity": mermaid_js_integrity()})
 
 @app.get("/", response_class=HTMLResponse, include_in_schema=False)
 async def home(request: Request):
-    return templates.TemplateResponse("getting_started.html", {"request": request, "title": "Getting Started"})
+    return page_cache.response(request, "getting_started.html", {"title": "Getting Started"})
 
 @app.get("/async-labels", response_class=HTMLResponse, include_in_schema=False)
 async def async_labels(request: Request):
@@ -204,98 +211,101 @@ async def tracking(request: Request):
 
 @app.get("/tracking-codes", response_class=HTMLResponse, include_in_schema=False)
 async def get_event_codes(request: Request):
-    all_data = {
-        "all_events": read_csv(csv_files["all_events"]),
-        "outbound": read_csv(csv_files["outbound"]),
-        "return": read_csv(csv_files["return"]),
-        "international": read_csv(csv_files["international"]),
-        "exceptions": read_csv(csv_files["exceptions"]),
-    }
+    all_data = {name: event_codes.file_view(name).tree for name in csv_files}
 
-    return templates.TemplateResponse("events.html", {"request": request, "data": all_data, "icons": milestone_icons})
+    return page_cache.response(request, "events.html", {"data": all_data, "icons": milestone_icons}, event_codes.revision)
 
 @app.get("/json/{file_name}", response_class=JSONResponse, include_in_schema=False)
-async def get_json(file_name: str):
+async def get_json(request: Request, file_name: str):
     if file_name not in csv_files:
         return JSONResponse({"error": "File not found"}, status_code=404)
 
-    if file_name == "outbound" or file_name == "return":
-        primary_file = csv_files[file_name]
-        international_file = csv_files["international"]
-        exception_file = csv_files["exceptions"]
-        
-        combined_csv = combine_csv_files_in_memory(primary_file, international_file, exception_file)
-        data = read_csv_stream_for_json(combined_csv)
-        return JSONResponse(data)
+    view = event_codes.export_view(file_name)
 
-    data = read_csv_for_json(csv_files[file_name])
-    return JSONResponse(data)
+    # Newline-delimited JSON, one event per line, when asked for with 'Accept: application/x-ndjson'
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        headers = {'ETag': f'"{file_name}-ndjson-{event_codes.revision}"', 'Vary': 'Accept'}
+        return StreamingResponse(stream_ndjson(view), media_type='application/x-ndjson', headers=headers)
+
+    headers = {'ETag': f'"{file_name}-json-{event_codes.revision}"', 'Vary': 'Accept'}
+    return StreamingResponse(stream_json(view), media_type='application/json', headers=headers)
 
 @app.get("/csv/{file_name}", response_class=StreamingResponse, include_in_schema=False)
 async def get_combined_csv(file_name: str):
     if file_name not in csv_files:
         return JSONResponse({"error": "File not found"}, status_code=404)
-    
-    primary_file = csv_files[file_name]
-    international_file = csv_files["international"]
-    exception_file = csv_files["exceptions"]
-    
-    combined_csv = combine_csv_files_in_memory(primary_file, international_file, exception_file)
-    
+
+    view = event_codes.export_view(file_name)
+
     headers = {
-        'Content-Disposition': f'attachment; filename={file_name}.csv'
+        'Content-Disposition': f'attachment; filename={file_name}.csv',
+        'ETag': f'"{file_name}-csv-{event_codes.revision}"'
     }
-    return StreamingResponse(combined_csv, media_type='text/csv', headers=headers)
+    return StreamingResponse(stream_csv(view), media_type='text/csv', headers=headers)
 
 @app.get("/api-label", response_class=HTMLResponse, include_in_schema=False)
 async def redoc(request: Request):
-    return templates.TemplateResponse("redoc.html", {"request": request, "spec_url": "/openapi-label.json", "title": "Label Endpoints"})
+    return page_cache.response(request, "redoc.html", {"spec_url": "/openapi-label.json", "title": "Label Endpoints"})
 
 @app.get("/api-manifest", response_class=HTMLResponse, include_in_schema=False)
 async def redoc(request: Request):
-    return templates.TemplateResponse("redoc.html", {"request": request, "spec_url": "/openapi-manifest.json", "title": "Manifest Endpoints"})
+    return page_cache.response(request, "redoc.html", {"spec_url": "/openapi-manifest.json", "title": "Manifest Endpoints"})
 
 @app.get("/api-tracking", response_class=HTMLResponse, include_in_schema=False)
 async def redoc(request: Request):
-    return templates.TemplateResponse("redoc.html", {"request": request, "spec_url": "/openapi-tracking.json", "title": "Tracking Endpoints"})
+    return page_cache.response(request, "redoc.html", {"spec_url": "/openapi-tracking.json", "title": "Tracking Endpoints"})
 
 @app.get("/api-pudo", response_class=HTMLResponse, include_in_schema=False)
 async def redoc(request: Request):
-    return templates.TemplateResponse("redoc.html", {"request": request, "spec_url": "/openapi-pudo.json", "title": "PUDO Endpoints"})
+    return page_cache.response(request, "redoc.html", {"spec_url": "/openapi-pudo.json", "title": "PUDO Endpoints"})
 
 @app.get("/openapi-{schema_type}.json", include_in_schema=False)
 async def gluey_openapi(schema_type: str):
-    if schema_type == "label":
-        openapi_schema = get_openapi_schema("Label API", "API endpoints to create shipments and print labels in Gluey.", "label", labels_documents_router.routes)
-    elif schema_type == "manifest":
-        openapi_schema = get_openapi_schema("Manifest API", "API endpoints to manifest shipments in Gluey.", "manifest", manifest_router.routes)
-    elif schema_type == "tracking":
-        openapi_schema = get_openapi_schema("Tracking API", "API endpoints to track shipments in Gluey.", "tracking", tracking_router.routes)
-    elif schema_type == "pudo":
-        openapi_schema = get_openapi_schema("PUDO API", "API endpoints to get PUDO locations in Gluey.", "pudo",pudo_router.routes)
-    elif schema_type == "book":
-        openapi_schema = get_openapi_schema("Book API", "API endpoints to book appointments with carriers.", "book",book_router.routes)
+    if schema_type not in openapi_schemas:
+        return JSONResponse({"error": "Schema not found"}, status_code=404)
 
-    return openapi_schema
+    return openapi_response(f"openapi-{schema_type}", openapi_schemas[schema_type])
 
 @app.get("/webhook-retry", response_class=HTMLResponse, include_in_schema=False)
 async def retry(request: Request):
-    return templates.TemplateResponse("retry.html", {"request": request, "title": "Webhook Retry Logic"})
+    return page_cache.response(request, "retry.html", {"title": "Webhook Retry Logic"})
 
 @app.get("/webhook-label", response_class=HTMLResponse, include_in_schema=False)
 async def redoc(request: Request):
-    return templates.TemplateResponse("redoc.html", {"request": request, "spec_url": "/openapiwebhook-label.json", "title": "Shipment Webhooks"})
+    return page_cache.response(request, "redoc.html", {"spec_url": "/openapiwebhook-label.json", "title": "Shipment Webhooks"})
 
 @app.get("/webhook-tracking", response_class=HTMLResponse, include_in_schema=False)
 async def redoc(request: Request):
-    return templates.TemplateResponse("redoc.html", {"request": request, "spec_url": "/openapiwebhook-tracking.json", "title": "Tracking Webhooks"})
+    return page_cache.response(request, "redoc.html", {"spec_url": "/openapiwebhook-tracking.json", "title": "Tracking Webhooks"})
 
 @app.get("/openapiwebhook-{schema_type}.json", include_in_schema=False)
 async def gluey_webhook_openapi(schema_type: str):
-    print(schema_type)
-    if schema_type == "label":
-        openapi_schema = get_openapi_schema("Shipment Webhook", "Webhook to subscribe to, and receive, updates to a Shipment.", "label", label_webhook_subscription_router.routes, label_webhook_router.routes)
-    elif schema_type == "tracking":
-        openapi_schema = get_openapi_schema("Tracking Webhook", "Webhooks to subscribe to, and receive, tracking events for a shipment.", "tracking", tracking_webhook_subscription_router.routes, tracking_webhook_router.routes)
-
-    return openapi_schema
\ No newline at end of file
+    if schema_type not in webhook_openapi_schemas:
+        return JSONResponse({"error": "Schema not found"}, status_code=404)
+
+    return openapi_response(f"openapiwebhook-{schema_type}", webhook_openapi_schemas[schema_type])
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+@app.get("/debug/profiles", include_in_schema=False)
+async def debug_profiles(request: Request):
+    if not debug_authorized(request.headers.get("x-debug-token")):
+        return JSONResponse({"error": "Not found"}, status_code=404)
+
+    return JSONResponse([profile.summary() for profile in reversed(profiler.profiles)])
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def debug_profile(request: Request, profile_id: int, format: str = "text"):
+    if not debug_authorized(request.headers.get("x-debug-token")):
+        return JSONResponse({"error": "Not found"}, status_code=404)
+
+    profile = profiler.get(profile_id)
+    if profile is None:
+        return JSONResponse({"error": "Profile not found"}, status_code=404)
+    if format == "folded":
+        return PlainTextResponse(profile.folded())
+    if format == "text":
+        return PlainTextResponse(profile.text())
+    return JSONResponse({"error": "Format must be text or folded"}, status_code=400)
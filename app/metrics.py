@@ -0,0 +1,78 @@
+"""Request and cache metrics of the docs server, exposed on /metrics in the Prometheus text format.
+
+With several Uvicorn workers each process only sees its own requests. Set PROMETHEUS_MULTIPROC_DIR to a directory that is
+emptied before the server starts, and every worker writes its samples there and /metrics aggregates all of them.
+"""
+import os
+import time
+from collections.abc import AsyncIterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+from starlette.requests import Request
+from starlette.responses import Response
+
+multiprocess_directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if multiprocess_directory:
+    os.makedirs(multiprocess_directory, exist_ok=True)
+
+request_duration = Histogram(
+    "gluey_docs_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response.",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+response_size = Histogram(
+    "gluey_docs_response_size_bytes",
+    "Size of the response body as sent, after compression.",
+    ["method", "route"],
+    buckets=tuple(2 ** exponent for exponent in range(8, 25, 2)),
+)
+
+cache_lookups = Counter(
+    "gluey_docs_cache_lookups_total",
+    "Lookups in the in-process caches, by cache and result (hit, miss, or for API keys also negative_hit and coalesced).",
+    ["cache", "result"],
+)
+
+def record_cache(cache: str, hit: bool):
+    record_cache_result(cache, "hit" if hit else "miss")
+
+def record_cache_result(cache: str, result: str):
+    cache_lookups.labels(cache, result).inc()
+
+def route_label(request: Request) -> str:
+    """The path template of the matched route, e.g. /json/{file_name}, so that labels do not grow with every URL."""
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounted apps such as /static set the mount path as root_path
+    return request.scope.get("root_path") or "unmatched"
+
+async def measured_body(body_iterator: AsyncIterator[bytes], method: str, route: str, status: str, started: float) -> AsyncIterator[bytes]:
+    size = 0
+    try:
+        async for chunk in body_iterator:
+            size += len(chunk)
+            yield chunk
+    finally:
+        request_duration.labels(method, route, status).observe(time.perf_counter() - started)
+        response_size.labels(method, route).observe(size)
+
+def measured_response(response: Response, method: str, route: str, started: float) -> Response:
+    """Observes response when its last chunk is sent, so streamed exports are measured in full, or now when it has its whole body."""
+    status = str(response.status_code)
+    if hasattr(response, "body_iterator"):
+        response.body_iterator = measured_body(response.body_iterator, method, route, status, started)
+    else:
+        request_duration.labels(method, route, status).observe(time.perf_counter() - started)
+        response_size.labels(method, route).observe(len(response.body))
+    return response
+
+def metrics_response() -> Response:
+    registry = REGISTRY
+    if multiprocess_directory:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,63 @@
+import hashlib
+import os
+
+from fastapi.templating import Jinja2Templates
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.compression import compress, negotiate_encoding
+from app.metrics import record_cache
+from app.templating import production, template_directory, templates
+
+class CachedPage:
+    """A rendered page with its gzip and brotli variants, compressed once when the page is rendered."""
+
+    def __init__(self, body: bytes):
+        self.etag = hashlib.sha256(body).hexdigest()
+        self.variants = {
+            "br": compress(body, "br"),
+            "gzip": compress(body, "gzip"),
+            "identity": body,
+        }
+
+    def response(self, request: Request) -> Response:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+
+        headers = {"ETag": f'"{self.etag}-{encoding}"', "Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type="text/html", headers=headers)
+
+class PageCache:
+    """Rendered HTML of pages that only change with their template or their data, served without re-entering Jinja."""
+
+    def __init__(self, templates: Jinja2Templates = templates):
+        self.templates = templates
+        self._pages: dict[str, tuple[tuple[str, str], CachedPage]] = {}
+
+    def template_version(self) -> str:
+        # Templates are only reloaded outside production, see app.templating
+        if production:
+            return ""
+        return str(max(entry.stat().st_mtime_ns for entry in os.scandir(template_directory) if entry.name.endswith(".html")))
+
+    def get(self, key: str, template_name: str, context: dict, data_version: str = "") -> CachedPage:
+        version = (self.template_version(), data_version)
+        cached = self._pages.get(key)
+        record_cache("page", hit=bool(cached and cached[0] == version))
+        if cached and cached[0] == version:
+            return cached[1]
+
+        body = self.templates.get_template(template_name).render(context).encode("utf-8")
+        page = CachedPage(body)
+        self._pages[key] = (version, page)
+        return page
+
+    def response(self, request: Request, template_name: str, context: dict, data_version: str = "") -> Response:
+        """The cached page for this request's path, rendered from template_name and context on a miss."""
+        return self.get(request.url.path, template_name, context, data_version).response(request)
+
+    def clear(self):
+        self._pages.clear()
+
+page_cache = PageCache()
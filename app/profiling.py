@@ -0,0 +1,165 @@
+"""Stack-sampling profiles of slow requests, kept in memory and served on /debug/profiles.
+
+Set SLOW_REQUEST_PROFILE_MS to profile every request and keep those that take longer. While a request is in flight its
+thread is sampled every PROFILE_SAMPLE_INTERVAL_MS; the samples of requests under the threshold are dropped. Async routes
+share the event loop thread, so a profile also contains samples of requests that ran concurrently with it.
+"""
+from collections import Counter, deque
+from datetime import datetime, timezone
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+
+slow_request_threshold = float(os.getenv("SLOW_REQUEST_PROFILE_MS", 0)) / 1000
+sample_interval = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5)) / 1000
+profile_buffer_size = int(os.getenv("PROFILE_BUFFER_SIZE", 20))
+
+# The debug routes answer 404 unless this token is configured and sent in the x-debug-token header
+debug_token = os.getenv("DEBUG_TOKEN")
+
+def debug_authorized(token: str | None) -> bool:
+    return bool(debug_token) and token is not None and hmac.compare_digest(token, debug_token)
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    filename = os.path.relpath(code.co_filename) if code.co_filename.startswith(os.getcwd()) else os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+def folded_stack(frame) -> str:
+    """The stack from the outermost frame in, joined by ';' as in the folded format of flamegraph.pl and speedscope."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class Recording:
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.samples: Counter[str] = Counter()
+
+class RequestProfile:
+    def __init__(self, profile_id: int, method: str, path: str, duration: float, samples: Counter[str], interval: float):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.duration = duration
+        self.captured_at = datetime.now(timezone.utc)
+        self.samples = samples
+        self.interval = interval
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": sum(self.samples.values()),
+            "captured_at": self.captured_at.isoformat(),
+        }
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def text(self, top: int = 30) -> str:
+        """The functions with the most samples, inclusive of their callees and by their own time."""
+        total = sum(self.samples.values()) or 1
+        inclusive: Counter[str] = Counter()
+        own: Counter[str] = Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+
+        lines = [f"{self.method} {self.path} took {self.duration * 1000:.1f}ms, {total} samples every {self.interval * 1000:g}ms", ""]
+        for title, counts in (("inclusive", inclusive), ("self", own)):
+            lines.append(f"{title:>9} %  function")
+            lines.extend(f"{count / total * 100:>11.1f}  {name}" for name, count in counts.most_common(top))
+            lines.append("")
+        return "\n".join(lines)
+
+class SlowRequestProfiler:
+    """Samples the threads of in-flight requests from a background thread and keeps the profiles of the slow ones."""
+
+    def __init__(self, threshold: float = slow_request_threshold, interval: float = sample_interval, size: int = profile_buffer_size):
+        self.threshold = threshold
+        self.interval = interval
+        self.profiles: deque[RequestProfile] = deque(maxlen=size)
+        self._recordings: set[Recording] = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def start(self) -> Recording:
+        recording = Recording(threading.get_ident())
+        with self._lock:
+            self._recordings.add(recording)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+            self._active.set()
+        return recording
+
+    def stop(self, recording: Recording, method: str, path: str) -> RequestProfile | None:
+        duration = time.perf_counter() - recording.started
+        with self._lock:
+            self._recordings.discard(recording)
+            if not self._recordings:
+                self._active.clear()
+        if duration < self.threshold:
+            return None
+
+        profile = RequestProfile(next(self._ids), method, path, duration, recording.samples, self.interval)
+        self.profiles.append(profile)
+        return profile
+
+    def get(self, profile_id: int) -> RequestProfile | None:
+        return next((profile for profile in self.profiles if profile.id == profile_id), None)
+
+    def _sample(self):
+        own_thread = threading.get_ident()
+        while True:
+            self._active.wait()
+            frames = sys._current_frames()
+            with self._lock:
+                recordings = list(self._recordings)
+            stacks = {}
+            for recording in recordings:
+                if recording.thread_id == own_thread or recording.thread_id not in frames:
+                    continue
+                # Requests on the same thread share one walk of its stack
+                if recording.thread_id not in stacks:
+                    stacks[recording.thread_id] = folded_stack(frames[recording.thread_id])
+                recording.samples[stacks[recording.thread_id]] += 1
+            del frames
+            time.sleep(self.interval)
+
+profiler = SlowRequestProfiler()
+
+class SlowRequestProfileMiddleware:
+    """Profiles every HTTP request with profiler until its response is sent. A plain ASGI middleware, which app.main only
+    adds when profiling is enabled, so it costs nothing otherwise."""
+
+    def __init__(self, app, profiler: SlowRequestProfiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        recording = self.profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.stop(recording, scope["method"], scope["path"])
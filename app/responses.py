@@ -0,0 +1,70 @@
+"""JSON response classes that encode to bytes without the standard library encoder, selected app-wide with JSON_RESPONSE_CLASS.
+
+- `orjson` (the default when orjson is installed): orjson for the dicts and lists FastAPI produces from a route's return value.
+- `pydantic`: pydantic-core's Rust encoder, with no extra dependency.
+- `standard`: Starlette's JSONResponse.
+
+With either fast class, a route that returns the response class with Pydantic models as its content has them encoded by
+pydantic-core straight to bytes, with no intermediate dict. `model_response` does this for the routes whose bodies are
+large enough for it to matter: the tracking lookups (single, batch, parcel and carrier tracking id) and the event-code
+lookups. The OpenAPI documents and event-code diffs are encoded once with `dumps` and cached. The label, manifest and
+PUDO routes have no bodies yet and keep FastAPI's serialization; PUDO pages should use `model_response` once they do.
+"""
+import os
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def contains_models(content: Any) -> bool:
+    if isinstance(content, BaseModel):
+        return True
+    return isinstance(content, list) and any(isinstance(item, BaseModel) for item in content)
+
+class PydanticJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content, by_alias=True)
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if contains_models(content):
+            return pydantic_core.to_json(content, by_alias=True)
+        return orjson.dumps(content, default=pydantic_core.to_jsonable_python, option=orjson.OPT_NON_STR_KEYS)
+
+json_response_classes = {
+    "standard": JSONResponse,
+    "pydantic": PydanticJSONResponse,
+    "orjson": ORJSONResponse,
+}
+
+json_response_name = os.getenv("JSON_RESPONSE_CLASS", "orjson" if orjson else "pydantic")
+if json_response_name not in json_response_classes:
+    raise ValueError(f"JSON_RESPONSE_CLASS must be one of {', '.join(json_response_classes)}, not '{json_response_name}'")
+if json_response_name == "orjson" and orjson is None:
+    raise ImportError("JSON_RESPONSE_CLASS=orjson requires the orjson package")
+
+json_response_class: type[JSONResponse] = json_response_classes[json_response_name]
+
+def dumps(content: Any) -> bytes:
+    """Content encoded as the selected response class would, for bodies that are serialized once and cached."""
+    return json_response_class(content).body
+
+def model_response(content: Any, **kwargs) -> JSONResponse:
+    """The selected response class for a route that returns Pydantic models, bypassing FastAPI's dict serialization.
+
+    FastAPI does not validate a returned Response against the route's response model, so content must already be
+    instances of the documented models. Fields are written by alias, as FastAPI does.
+    """
+    if json_response_class is JSONResponse:
+        content = pydantic_core.to_jsonable_python(content, by_alias=True)
+    return json_response_class(content, **kwargs)
+
+class NDJSONResponse(StreamingResponse):
+    """A stream of newline-delimited JSON."""
+    media_type = "application/x-ndjson"
@@ -0,0 +1,37 @@
+"""The Jinja2 environment for the docs pages, with a filesystem bytecode cache shared by every Uvicorn worker.
+
+The cache is filled at image build time, so no worker compiles a template on its first request:
+
+    python -m app.templating
+"""
+import os
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+
+template_directory = "app/api/v1/templates"
+bytecode_cache_directory = os.getenv("TEMPLATE_BYTECODE_CACHE", "./app/api/v1/templates/.bytecode")
+
+# In production the templates never change after the image is built, so Jinja does not need to stat them on every render
+production = os.getenv("ENVIRONMENT", "development") == "production"
+
+def create_templates() -> Jinja2Templates:
+    os.makedirs(bytecode_cache_directory, exist_ok=True)
+    return Jinja2Templates(
+        directory=template_directory,
+        bytecode_cache=FileSystemBytecodeCache(bytecode_cache_directory),
+        auto_reload=not production
+    )
+
+def precompile_templates(templates: Jinja2Templates) -> list[str]:
+    """Compile every HTML template, which writes its bytecode to the cache directory."""
+    names = templates.env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    for name in names:
+        templates.env.get_template(name)
+    return names
+
+templates = create_templates()
+
+if __name__ == "__main__":
+    for name in precompile_templates(templates):
+        print(name)
@@ -0,0 +1,142 @@
+"""Throughput and latency of every docs route and of request validation for the heavy API models, in-process with no network.
+
+Routes are driven through the ASGI app with httpx; the models are validated from raw JSON bytes as FastAPI does for a request
+body. Results are written as JSON so runs on two commits can be compared. Run from the repository root:
+
+    python -m benchmarks.asgi_suite --output before.json
+    python -m benchmarks.asgi_suite --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import httpx
+from pydantic import TypeAdapter
+
+from app.api.v1.label.models.api.create_shipment import CreateShipmentRequest
+from app.api.v1.label.models.api.print_label import PrintAndBookRequest
+from app.api.v1.tracking.models.webhooks.tracking_event import TrackingWebhookEvent
+from app.export import export_paths
+from app.main import app
+from benchmarks.payloads import create_shipment_payload, print_and_book_payload, tracking_webhook_payload
+
+api_headers = {"x-key": "gl-acc-benchmark", "x-version": "v1"}
+
+# API routes served by this app that are not part of the documentation site
+api_paths = ["/event-codes/order_created?milestone=start", "/event-codes/collected/other", "/event-codes/diff/v1/v2"]
+
+def validation_cases() -> dict[str, tuple[TypeAdapter, bytes]]:
+    return {
+        "validate CreateShipmentRequest": (TypeAdapter(CreateShipmentRequest), json.dumps(create_shipment_payload()).encode()),
+        "validate PrintAndBookRequest": (TypeAdapter(PrintAndBookRequest), json.dumps(print_and_book_payload()).encode()),
+        "validate list[TrackingWebhookEvent]": (TypeAdapter(list[TrackingWebhookEvent]), json.dumps(tracking_webhook_payload()).encode()),
+    }
+
+def summarize(name: str, latencies: list[float], elapsed: float, size: int) -> dict:
+    milliseconds = sorted(latency * 1000 for latency in latencies)
+    quantiles = statistics.quantiles(milliseconds, n=100)
+    return {
+        "name": name,
+        "iterations": len(milliseconds),
+        "per_second": round(len(milliseconds) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(milliseconds), 4),
+        "p50_ms": round(quantiles[49], 4),
+        "p95_ms": round(quantiles[94], 4),
+        "p99_ms": round(quantiles[98], 4),
+        "max_ms": round(milliseconds[-1], 4),
+        "bytes": size,
+    }
+
+async def benchmark_request(http: httpx.AsyncClient, name: str, method: str, path: str, iterations: int, warmup: int, **kwargs) -> dict:
+    for _ in range(warmup):
+        response = await http.request(method, path, **kwargs)
+        response.raise_for_status()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        request_started = time.perf_counter()
+        response = await http.request(method, path, **kwargs)
+        latencies.append(time.perf_counter() - request_started)
+    return summarize(name, latencies, time.perf_counter() - started, len(response.content))
+
+def benchmark_validation(name: str, adapter: TypeAdapter, body: bytes, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        adapter.validate_json(body)
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        validation_started = time.perf_counter()
+        adapter.validate_json(body)
+        latencies.append(time.perf_counter() - validation_started)
+    return summarize(name, latencies, time.perf_counter() - started, len(body))
+
+async def run_routes(iterations: int, warmup: int, accept_encoding: str) -> list[dict]:
+    results = []
+    headers = {"accept-encoding": accept_encoding}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://docs", headers=headers) as http:
+        for path in export_paths() + api_paths:
+            results.append(await benchmark_request(http, f"GET {path}", "GET", path, iterations, warmup))
+        results.append(await benchmark_request(http, "POST /webhook/tracking", "POST", "/webhook/tracking", iterations, warmup, content=json.dumps(tracking_webhook_payload()), headers={"content-type": "application/json"}))
+    return results
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: list[dict], baseline: dict):
+    previous = {result["name"]: result for result in baseline["results"]}
+    print(f"\ncompared with {baseline.get('commit')}:")
+    print(f"{'name':<60}{'p50 ms':>10}{'before':>10}{'change':>9}")
+    for result in results:
+        if result["name"] not in previous:
+            continue
+        before = previous[result["name"]]["p50_ms"]
+        change = (result["p50_ms"] - before) / before * 100 if before else 0.0
+        print(f"{result['name']:<60}{result['p50_ms']:>10.3f}{before:>10.3f}{change:>+8.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="Timed requests or validations per case")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests or validations per case, which also fill the caches")
+    parser.add_argument("--accept-encoding", default="br, gzip", help="Accept-Encoding sent with every request")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--output", help="Write the results as JSON to this file, otherwise to stdout")
+    parser.add_argument("--compare", help="A previous --output file to compare the p50 latencies with")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_routes(args.iterations, args.warmup, args.accept_encoding))
+    for name, (adapter, body) in validation_cases().items():
+        results.append(benchmark_validation(name, adapter, body, args.iterations, args.warmup))
+    results = [result for result in results if args.filter in result["name"]]
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "accept_encoding": args.accept_encoding,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"{'name':<60}{'per second':>12}{'p50 ms':>10}{'p99 ms':>10}")
+        for result in results:
+            print(f"{result['name']:<60}{result['per_second']:>12.0f}{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
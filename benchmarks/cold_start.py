@@ -0,0 +1,98 @@
+"""Cold-start time of the docs server: importing app.main in a fresh interpreter, and its first response.
+
+Prints the slowest modules from `python -X importtime` and the median cold start. The budget, and that the
+markdown/Mermaid/Pygments stack is only loaded by the first guide page, are checked by tests/test_cold_start.py. Run from
+the repository root:
+
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Timed in the child interpreter, so the parent's imports do not count. The app is called as a bare ASGI callable:
+# TestClient imports httpx, which imports Pygments, and would make the lazy-loading check fail on its own.
+cold_start = """
+import asyncio, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def get(path):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": [(b"host", b"localhost")],
+             "client": ("127.0.0.1", 0), "server": ("localhost", 80)}
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+    statuses = []
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client never disconnects, so a listener for http.disconnect waits until the response is sent
+        await asyncio.Event().wait()
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+    await app.main.app(scope, receive, send)
+    if statuses != [200]:
+        raise RuntimeError(f"GET {path} returned {statuses}")
+
+async def main():
+    lifespan = asyncio.Queue()
+    ready = asyncio.Event()
+    async def send(message):
+        if message["type"].startswith("lifespan.startup"):
+            ready.set()
+    await lifespan.put({"type": "lifespan.startup"})
+    server = asyncio.create_task(app.main.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, lifespan.get, send))
+    await ready.wait()
+
+    await get("/openapi-label.json")
+    responded = time.perf_counter()
+    eager = sorted({name.split(".")[0] for name in sys.modules if name.split(".")[0] in ("markdown", "pygments", "mermaid")})
+    await get("/async-labels")
+    first_guide = time.perf_counter()
+
+    await lifespan.put({"type": "lifespan.shutdown"})
+    await server
+    print(imported - started, responded - started, first_guide - responded, ",".join(eager))
+
+asyncio.run(main())
+"""
+
+def run_cold_start() -> tuple[float, float, float, str]:
+    output = subprocess.run([sys.executable, "-c", cold_start], capture_output=True, text=True, check=True).stdout.split()
+    return float(output[0]), float(output[1]), float(output[2]), output[3] if len(output) > 3 else ""
+
+def import_profile(top: int) -> list[tuple[int, int, str]]:
+    """(self us, cumulative us, module) of the slowest imports of app.main."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], capture_output=True, text=True, check=True).stderr
+    profile = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line.removeprefix("import time:").split("|")
+        profile.append((int(self_us), int(cumulative_us), module.strip()))
+    return sorted(profile, key=lambda entry: entry[1], reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters started")
+    parser.add_argument("--top", type=int, default=20, help="Slowest imports listed")
+    args = parser.parse_args()
+
+    print(f"{'self ms':>9}{'cumulative ms':>15}  module")
+    for self_us, cumulative_us, module in import_profile(args.top):
+        print(f"{self_us / 1000:>9.1f}{cumulative_us / 1000:>15.1f}  {module}")
+
+    runs = [run_cold_start() for _ in range(args.runs)]
+    imported = statistics.median(run[0] for run in runs)
+    responded = statistics.median(run[1] for run in runs)
+    first_guide = statistics.median(run[2] for run in runs)
+    print(f"\nimport app.main: {imported * 1000:.0f}ms  first response: {responded * 1000:.0f}ms  first guide page: {first_guide * 1000:.0f}ms")
+    eager = {module for run in runs for module in run[3].split(",") if module}
+    if eager:
+        print(f"{', '.join(sorted(eager))} loaded before the first guide page")
+
+if __name__ == "__main__":
+    main()
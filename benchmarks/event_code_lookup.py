@@ -0,0 +1,50 @@
+"""Latency of resolving (milestone, code, sub_code) triples against synthetic catalogues of growing size.
+
+Run from the repository root:
+
+    python -m benchmarks.event_code_lookup --queries 10000
+"""
+import argparse
+import random
+import time
+
+from app.api.v1.tracking.event_codes import resolve_event_codes
+from app.api.v1.tracking.models.api.event_codes import EventCodeQuery
+from app.api.v1.tracking.models.base_models import GlueyMilestone
+from app.event_codes import EventCodeView
+
+header = ["milestone", "code", "sub_code", "detailed_explanation"]
+milestones = [milestone.value for milestone in GlueyMilestone]
+
+def synthetic_view(size: int) -> EventCodeView:
+    rows = [[milestones[i % len(milestones)], f"code_{i // 10}", f"sub_code_{i % 10}", f"Explanation of event {i}."] for i in range(size)]
+    return EventCodeView(f"synthetic_{size}", header, rows)
+
+def synthetic_queries(view: EventCodeView, queries: int) -> list[EventCodeQuery]:
+    rng = random.Random(queries)
+    result = []
+    for _ in range(queries):
+        milestone, code, sub_code, _ = rng.choice(view.rows)
+        # Every fourth query misses, so both paths are measured
+        if rng.random() < 0.25:
+            code = f"unknown_{code}"
+        result.append(EventCodeQuery(milestone=milestone, code=code, sub_code=sub_code))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=10000, help="Triples resolved per catalogue size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000], help="Catalogue sizes in rows")
+    args = parser.parse_args()
+
+    print(f"{'catalogue rows':>15}{'us / lookup':>14}{'lookups / s':>14}")
+    for size in args.sizes:
+        view = synthetic_view(size)
+        queries = synthetic_queries(view, args.queries)
+        started = time.perf_counter()
+        resolve_event_codes(view, queries)
+        elapsed = time.perf_counter() - started
+        print(f"{size:>15}{elapsed / args.queries * 1e6:>14.2f}{args.queries / elapsed:>14.0f}")
+
+if __name__ == "__main__":
+    main()
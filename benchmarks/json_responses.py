@@ -0,0 +1,56 @@
+"""Encoding time of the largest JSON responses with each class in app.responses.
+
+"via dict" is FastAPI's path for a route that returns models: they are dumped to a dict of JSON types and then rendered
+by the response class. "direct" is app.responses.model_response, which hands the models to pydantic-core. Run from the
+repository root:
+
+    python -m benchmarks.json_responses --iterations 50
+"""
+import argparse
+import time
+
+from pydantic import TypeAdapter
+
+from app.api.v1.pudo.models.api.pudo import PudoPoint
+from app.api.v1.tracking.models.api.track_batch import BatchTrackShipment
+from app.main import openapi_schemas
+from app.responses import json_response_classes
+from benchmarks.payloads import example_instance
+
+def timed(encode, iterations: int) -> tuple[float, int]:
+    body = encode()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encode()
+    return (time.perf_counter() - started) / iterations, len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50, help="Encodings per case")
+    parser.add_argument("--shipments", type=int, default=100, help="BatchTrackShipment models in the batch tracking response")
+    parser.add_argument("--pudo-points", type=int, default=500, help="PudoPoint models in the PUDO page")
+    args = parser.parse_args()
+
+    responses = {
+        f"POST /track, {args.shipments} shipments": (list[BatchTrackShipment], [example_instance(BatchTrackShipment, list_length=3)] * args.shipments),
+        f"GET /pudo, {args.pudo_points} points": (list[PudoPoint], [example_instance(PudoPoint)] * args.pudo_points),
+    }
+
+    print(f"{'response':<34}{'class':<10}{'path':<9}{'ms':>9}{'bytes':>10}")
+    for name, build_schema in openapi_schemas.items():
+        schema = build_schema()
+        for class_name, response_class in json_response_classes.items():
+            seconds, size = timed(lambda: response_class(schema).body, args.iterations)
+            print(f"{f'GET /openapi-{name}.json':<34}{class_name:<10}{'dict':<9}{seconds * 1000:>9.3f}{size:>10}")
+
+    for name, (annotation, models) in responses.items():
+        adapter = TypeAdapter(annotation)
+        for class_name, response_class in json_response_classes.items():
+            seconds, size = timed(lambda: response_class(adapter.dump_python(models, mode="json")).body, args.iterations)
+            print(f"{name:<34}{class_name:<10}{'via dict':<9}{seconds * 1000:>9.3f}{size:>10}")
+            if class_name != "standard":
+                seconds, size = timed(lambda: response_class(models).body, args.iterations)
+                print(f"{name:<34}{class_name:<10}{'direct':<9}{seconds * 1000:>9.3f}{size:>10}")
+
+if __name__ == "__main__":
+    main()
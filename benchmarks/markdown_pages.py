@@ -0,0 +1,39 @@
+"""Requests per second for the markdown guide pages, with the page cache cleared before every request (cold) and kept warm.
+
+Run from the repository root:
+
+    python -m benchmarks.markdown_pages --requests 200
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.v1.templates.markdown_pages import markdown_pages
+
+routes = ["/async-labels", "/sync-labels", "/book", "/tracking"]
+
+def requests_per_second(client: TestClient, route: str, requests: int, cold: bool) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        if cold:
+            markdown_pages.clear()
+        response = client.get(route)
+        response.raise_for_status()
+    return requests / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route and mode")
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    print(f"{'route':<16}{'cold req/s':>12}{'cached req/s':>14}{'speedup':>10}")
+    for route in routes:
+        cold = requests_per_second(client, route, args.requests, cold=True)
+        cached = requests_per_second(client, route, args.requests, cold=False)
+        print(f"{route:<16}{cold:>12.1f}{cached:>14.1f}{cached / cold:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Latency percentiles of the cached docs pages with 500 concurrent clients, driven in-process through the ASGI app.
+
+Run from the repository root:
+
+    python -m benchmarks.page_cache_load --clients 500 --requests 20
+
+--uncached re-renders every page through Jinja on every request, which is how the pages were served before the page cache.
+"""
+import argparse
+import asyncio
+import hashlib
+import statistics
+import time
+
+import httpx
+
+import app.main
+from app.page_cache import CachedPage, PageCache
+
+routes = ["/tracking-codes", "/", "/webhook-retry", "/api-label", "/api-tracking", "/webhook-tracking"]
+
+class RenderedPage(CachedPage):
+    def __init__(self, body: bytes):
+        self.etag = hashlib.sha256(body).hexdigest()
+        self.variants = {"identity": body}
+
+class UncachedPageCache(PageCache):
+    def get(self, key: str, template_name: str, context: dict, data_version: str = "") -> CachedPage:
+        return RenderedPage(self.templates.get_template(template_name).render(context).encode("utf-8"))
+
+async def client(http: httpx.AsyncClient, client_id: int, requests: int, accept_encoding: str, latencies: list[float]):
+    for i in range(requests):
+        route = routes[(client_id + i) % len(routes)]
+        started = time.perf_counter()
+        response = await http.get(route, headers={"accept-encoding": accept_encoding})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+async def run(clients: int, requests: int, accept_encoding: str) -> tuple[list[float], float]:
+    latencies = []
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://docs") as http:
+        # Warm the caches so the run measures steady state
+        for route in routes:
+            await http.get(route, headers={"accept-encoding": accept_encoding})
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http, i, requests, accept_encoding, latencies) for i in range(clients)))
+        return latencies, time.perf_counter() - started
+
+def percentile(values: list[float], p: float) -> float:
+    return statistics.quantiles(values, n=1000)[int(p * 10) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--accept-encoding", default="br, gzip", help="Accept-Encoding sent by the clients")
+    parser.add_argument("--uncached", action="store_true", help="Render every page through Jinja on every request")
+    args = parser.parse_args()
+
+    if args.uncached:
+        app.main.page_cache = UncachedPageCache()
+        args.accept_encoding = "identity"
+
+    latencies, elapsed = asyncio.run(run(args.clients, args.requests, args.accept_encoding))
+    print(f"mode={'uncached' if args.uncached else 'cached'} clients={args.clients} requests={len(latencies)} req/s={len(latencies) / elapsed:.0f}")
+    print(f"p50={percentile(latencies, 50) * 1000:.1f}ms p95={percentile(latencies, 95) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms max={max(latencies) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Representative request bodies and response models for the heavy API models, shared by the benchmarks."""
+from datetime import date, datetime, timezone
+from enum import Enum
+from types import UnionType
+from typing import Literal, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from app.api.v1.tracking.http_responses.requests import webhook_post_examples
+
+def address(name: str, city: str, iso_country: str) -> dict:
+    return {
+        "name": name,
+        "street": "1 Example Street",
+        "street_2": "Unit 4",
+        "postal_code": "EC1A 1BB",
+        "city": city,
+        "iso_country": iso_country,
+        "contact": {"name": name, "email": "parcels@example.com", "mobile": "+441234567890"},
+    }
+
+def item(index: int) -> dict:
+    return {
+        "uuid_ref": f"item-{index}",
+        "description": "Blue Printed T-shirt",
+        "quantity": 2,
+        "unit_value": {"amount": 12.5, "currency": "GBP"},
+        "unit_weight": {"value": 0.2, "unit": "kg"},
+        "hs_code": "610910",
+        "country_of_origin": "GB",
+        "sku": f"TSHIRT-BLUE-{index}",
+        "meta_data": [{"key": "colour", "value": "blue"}, {"key": "size", "value": "L"}],
+    }
+
+def create_shipment_payload(parcels: int = 5, items: int = 10) -> dict:
+    """A CreateShipmentRequest body for a cross-border shipment of several parcels."""
+    return {
+        "carrier": {"id": "ups", "gluey_profile": "default"},
+        "shipment": {
+            "uuid_ref": "order-100234",
+            "references": {"shipper": "ORDER-100234", "receiver": "PO-5531"},
+            "addresses": {
+                "from_address": address("Gluey Warehouse", "London", "GB"),
+                "to_address": address("Jane Doe", "Berlin", "DE"),
+                "undeliverable_address": address("Gluey Returns", "Leeds", "GB"),
+            },
+            "parcels": [
+                {
+                    "uuid_ref": f"parcel-{parcel}",
+                    "weight": {"value": 4.2, "unit": "kg"},
+                    "dimensions": {"length": 40, "width": 30, "height": 20, "unit": "cm"},
+                    "goods_description": "wearing apparel",
+                    "package_type": "box",
+                    "items": [item(parcel * items + index) for index in range(items)],
+                }
+                for parcel in range(parcels)
+            ],
+        },
+    }
+
+def print_and_book_payload() -> dict:
+    """A PrintAndBookRequest body that books a collection and asks for a PDF label."""
+    return {
+        "carrier_service_id": {"id": "ups_express"},
+        "book_collection": {"start": "2026-03-02T09:00:00+00:00", "end": "2026-03-02T17:00:00+00:00"},
+        "label": {"format": "pdf", "size": "4x6"},
+    }
+
+def tracking_webhook_payload(events: int = 100) -> list[dict]:
+    """A list[TrackingWebhookEvent] body built by repeating the documented webhook examples."""
+    examples = [event.model_dump(mode="json") for example in webhook_post_examples.values() for event in example["value"]]
+    return [examples[index % len(examples)] for index in range(events)]
+
+def example_value(annotation, list_length: int):
+    """A value for a field annotation with every optional field filled in, so that responses are as large as the model allows."""
+    origin = get_origin(annotation)
+    if origin in (Union, UnionType):
+        return example_value(next(arg for arg in get_args(annotation) if arg is not type(None)), list_length)
+    if origin in (list, set, tuple):
+        return [example_value(get_args(annotation)[0], list_length) for _ in range(list_length)]
+    if origin is dict:
+        return {"key": example_value(get_args(annotation)[1], list_length)}
+    if origin is Literal:
+        return get_args(annotation)[0]
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return example_instance(annotation, list_length)
+        if issubclass(annotation, Enum):
+            return next(iter(annotation))
+        if issubclass(annotation, bool):
+            return True
+        if issubclass(annotation, int):
+            return 42
+        if issubclass(annotation, float):
+            return 4.2
+        if issubclass(annotation, datetime):
+            return datetime(2026, 3, 2, 9, 30, tzinfo=timezone.utc)
+        if issubclass(annotation, date):
+            return date(2026, 3, 2)
+    return "example"
+
+def example_instance(model: type[BaseModel], list_length: int = 2) -> BaseModel:
+    return model(**{name: example_value(field.annotation, list_length) for name, field in model.model_fields.items()})
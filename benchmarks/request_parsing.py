@@ -0,0 +1,65 @@
+"""Request body parsing: json.loads followed by validation of the Python objects, against validation straight from the raw bytes.
+
+The bodies are the documented examples in the label and tracking request_examples, and CreateShipmentRequest bodies of
+growing size from benchmarks.payloads. Run from the repository root:
+
+    python -m benchmarks.request_parsing --iterations 200
+"""
+import argparse
+import json
+import time
+
+from app.api.v1.common.routing import type_adapter
+from app.api.v1.label.http_responses.request_examples import collection_request_examples, delivery_request_examples, service_availability_request_examples
+from app.api.v1.label.models.api.collection import CollectionRequest, DeliveryRequest, ServiceAvailabilityRequest
+from app.api.v1.label.models.api.create_shipment import CreateShipmentRequest
+from app.api.v1.label.models.api.print_label import PrintAndBookRequest
+from app.api.v1.manifest.models.api.manifest_shipments_request import ManifestShipmentsRequest
+from app.api.v1.tracking.http_responses.requests import webhook_post_examples
+from app.api.v1.tracking.models.webhooks.tracking_event import TrackingWebhookEvent
+from benchmarks.payloads import create_shipment_payload, print_and_book_payload, tracking_webhook_payload
+
+def example_bodies(model_name: str, annotation, examples: dict) -> list[tuple[str, object, bytes]]:
+    cases = []
+    for name, example in examples.items():
+        value = example["value"]
+        if isinstance(value, list):
+            value = [item.model_dump(mode="json") for item in value]
+        cases.append((f"{model_name} {name}", annotation, json.dumps(value, default=str).encode()))
+    return cases
+
+def cases() -> list[tuple[str, object, bytes]]:
+    result = []
+    result += example_bodies("ServiceAvailabilityRequest", ServiceAvailabilityRequest, service_availability_request_examples)
+    result += example_bodies("CollectionRequest", CollectionRequest, collection_request_examples)
+    result += example_bodies("DeliveryRequest", DeliveryRequest, delivery_request_examples)
+    result += example_bodies("list[TrackingWebhookEvent]", list[TrackingWebhookEvent], webhook_post_examples)
+    result.append(("PrintAndBookRequest", PrintAndBookRequest, json.dumps(print_and_book_payload()).encode()))
+    result.append(("ManifestShipmentsRequest", ManifestShipmentsRequest, json.dumps({"uuid_ref": "manifest-1", "shipment_ids": "a,b,c"}).encode()))
+    result.append(("list[TrackingWebhookEvent] 500 events", list[TrackingWebhookEvent], json.dumps(tracking_webhook_payload(500)).encode()))
+    for parcels, items in ((1, 1), (10, 10), (100, 10), (300, 20)):
+        result.append((f"CreateShipmentRequest {parcels} parcels x {items} items", CreateShipmentRequest, json.dumps(create_shipment_payload(parcels, items)).encode()))
+    return result
+
+def timed(parse, iterations: int) -> float:
+    parse()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        parse()
+    return (time.perf_counter() - started) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200, help="Parses per body and path")
+    args = parser.parse_args()
+
+    print(f"{'body':<62}{'bytes':>10}{'two-stage us':>14}{'raw bytes us':>14}{'speed-up':>10}")
+    for name, annotation, body in cases():
+        adapter = type_adapter(annotation)
+        assert adapter.validate_python(json.loads(body)) == adapter.validate_json(body)
+        two_stage = timed(lambda: adapter.validate_python(json.loads(body)), args.iterations)
+        raw_bytes = timed(lambda: adapter.validate_json(body), args.iterations)
+        print(f"{name:<62}{len(body):>10}{two_stage * 1e6:>14.1f}{raw_bytes * 1e6:>14.1f}{two_stage / raw_bytes:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+import pytest
+
+# Read when app.main is imported, so they are set before any test module imports it
+os.environ.setdefault("RATE_LIMIT_FILE", os.path.join(tempfile.mkdtemp(), "rate-limits"))
+os.environ.setdefault("RATE_LIMIT_CAPACITY", "100")
+
+from fastapi.testclient import TestClient
+
+from app.api.v1.common.api_keys import AnyKeyResolver, ApiKeyAccount, StaticKeyResolver, configure_key_resolver
+from app.api.v1.tracking import updates as tracking_updates
+from app.api.v1.tracking.store import TrackingStore, configure_shipment_source, tracker
+from app.main import app
+
+valid_key = "gl-test-key"
+
+@pytest.fixture
+def client() -> TestClient:
+    # A new client address per test, so the tests never share the rate-limit bucket of a key without an account
+    return TestClient(app, client=(f"10.{os.urandom(1)[0]}.{os.urandom(1)[0]}.{os.urandom(1)[0]}", 50000))
+
+@pytest.fixture
+def headers() -> dict[str, str]:
+    return {"x-key": f"{valid_key}-{os.urandom(4).hex()}", "x-version": "v1"}
+
+@pytest.fixture
+def static_keys():
+    configure_key_resolver(StaticKeyResolver({valid_key: ApiKeyAccount(account_number="test")}))
+    yield {"x-key": valid_key, "x-version": "v1"}
+    configure_key_resolver(AnyKeyResolver())
+
+@pytest.fixture
+def store() -> TrackingStore:
+    source = tracker.source
+    store = TrackingStore()
+    configure_shipment_source(store)
+    yield store
+    configure_shipment_source(source)
+
+@pytest.fixture
+def updates(monkeypatch) -> dict[str, str]:
+    monkeypatch.setattr(tracking_updates, "updates_token", "test-updates-token")
+    return {"x-internal-token": "test-updates-token"}
@@ -0,0 +1,41 @@
+"""Tracking data for the tests, built from the API models with only the fields the tests look at."""
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.api.v1.common.models.base_models import References, TrackingLevel
+from app.api.v1.tracking.models.api.track_batch import BatchTrackShipment
+from app.api.v1.tracking.models.api.tracking_event import TrackingData, TrackingEvent, TrackingEventParcel
+from app.api.v1.tracking.models.base_models import CarrierEventCodeDetail, GlueyEventCodeDetail, GlueyMilestone, TrackingEventCodes, TrackingEventDateTime, TrackingEventLocation
+from app.api.v1.tracking.models.webhooks import tracking_event as webhook_models
+
+created = datetime(2026, 10, 1, 12, tzinfo=timezone.utc)
+
+codes = TrackingEventCodes(
+    gluey=GlueyEventCodeDetail(milestone=GlueyMilestone.IN_TRANSIT, code="carrier", sub_code="arrived_at_hub", freetext_detail="Arrived at the carrier's hub."),
+    carrier=CarrierEventCodeDetail(code="ARR"))
+
+def tracking_event(moment: datetime = created, eta: Optional[str] = None) -> TrackingEvent:
+    """An event created at moment. eta tells the events of a test apart."""
+    return TrackingEvent(event_time=TrackingEventDateTime(created_utc=moment, carrier_utc=moment), eta=eta, codes=codes, location=TrackingEventLocation())
+
+def parcel(id: str, events: list[TrackingEvent], carrier_tracking_id: Optional[str] = None) -> TrackingEventParcel:
+    ids = {"carrier_tracking_id": carrier_tracking_id} if carrier_tracking_id else {}
+    return TrackingEventParcel(id=id, tracking_data=TrackingData(events=events), **ids)
+
+def shipment(id: str, events: list[TrackingEvent], **update) -> BatchTrackShipment:
+    """A shipment with tracking_level=shipment and events, unless update sets other parcels or tracking data."""
+    return BatchTrackShipment(**{"id": id, "uuid_ref": f"ref-{id}", "tracking_level": TrackingLevel.SHIPMENT, "references": References(), "tracking_data": TrackingData(events=events), **update})
+
+def parcel_shipment(id: str, parcels: list[TrackingEventParcel]) -> BatchTrackShipment:
+    return shipment(id, [], tracking_level=TrackingLevel.PARCEL, parcels=parcels, tracking_data=None)
+
+def webhook_event(shipment_id: str, carrier_tracking_id: str, new_carrier_tracking_id: Optional[str] = None, moment: datetime = created) -> dict:
+    """The JSON of a shipment-level tracking webhook event, which assigns new_carrier_tracking_id when it is set."""
+    event = webhook_models.TrackingWebhookEvent(
+        shipment_id=shipment_id,
+        carrier_id="carrier",
+        carrier_tracking_id=carrier_tracking_id,
+        carrier_tracking_update=webhook_models.TrackableReferenceUpdate(new_carrier_tracking_id=new_carrier_tracking_id) if new_carrier_tracking_id else None,
+        tracking_level=TrackingLevel.SHIPMENT,
+        event=webhook_models.TrackingEvent(event_time=TrackingEventDateTime(created_utc=moment, carrier_utc=moment), codes=codes, location=TrackingEventLocation()))
+    return event.model_dump(mode="json")
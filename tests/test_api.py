@@ -0,0 +1,159 @@
+import asyncio
+import fcntl
+import threading
+from datetime import timedelta
+from email.utils import format_datetime
+
+import pytest
+
+from app.api.v1.common.api_keys import ApiKeyAccount, CachedKeyResolver
+from app.api.v1.common.rate_limits import SharedTokenBuckets
+from tests.payloads import created, shipment, tracking_event, webhook_event
+
+def test_invalid_key_is_rejected_before_the_body_is_validated(client, static_keys):
+    response = client.post("/track", content=b'{"ids": 1}', headers={**static_keys, "x-key": "invalid", "content-type": "application/json"})
+    assert response.status_code == 401
+
+def test_body_errors_are_reported_with_header_errors(client):
+    response = client.post("/track", content=b"[]", headers={"x-version": "v1", "content-type": "application/json"})
+    assert response.status_code == 422
+    assert [(error["type"], error["loc"]) for error in response.json()["detail"]] == [
+        ("missing", ["header", "x-key"]),
+        ("model_attributes_type", ["body"]),
+    ]
+
+def test_invalid_json_has_the_stock_error(client, headers):
+    response = client.post("/track", content=b'{"ids": ', headers={**headers, "content-type": "application/json"})
+    assert response.status_code == 422
+    assert response.json()["detail"] == [{"type": "json_invalid", "loc": ["body", 8], "msg": "JSON decode error", "input": {}, "ctx": {"error": "Expecting value"}}]
+
+class SlowKeyResolver:
+    def __init__(self):
+        self.calls = 0
+
+    async def resolve(self, key: str) -> ApiKeyAccount | None:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return ApiKeyAccount(account_number=key)
+
+def test_cancelled_key_lookup_does_not_cancel_the_requests_waiting_for_it():
+    async def lookups():
+        resolver = SlowKeyResolver()
+        keys = CachedKeyResolver(resolver)
+        leader = asyncio.create_task(keys.resolve("key"))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(keys.resolve("key")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        accounts = await asyncio.gather(*followers)
+        return leader, accounts, resolver.calls
+
+    leader, accounts, calls = asyncio.run(lookups())
+    assert leader.cancelled()
+    assert [account.account_number for account in accounts] == ["key"] * 3
+    # The cancelled call, and the one of the request that took over from it
+    assert calls == 2
+
+def test_rate_limit_headers_are_sent_on_responses_routes_return(client, headers, store):
+    store.add(shipment("S1", [tracking_event(created)]))
+    responses = [
+        client.get("/shipments/S1/track", headers=headers),
+        client.get("/shipments/S1/track", params={"since": created.isoformat()}, headers=headers),
+        client.post("/track/stream", json={"ids": ["S1"]}, headers=headers),
+    ]
+    assert [response.status_code for response in responses] == [200, 204, 200]
+    assert [response.headers["ratelimit-limit"] for response in responses] == ["100"] * 3
+    assert int(responses[0].headers["ratelimit-remaining"]) > int(responses[2].headers["ratelimit-remaining"])
+
+def test_new_keys_without_an_account_do_not_get_a_new_bucket(client, headers, store):
+    store.add(shipment("S1", [tracking_event(created)]))
+    first = client.get("/shipments/S1/track", headers=headers)
+    second = client.get("/shipments/S1/track", headers={**headers, "x-key": f"{headers['x-key']}-new"})
+    assert int(second.headers["ratelimit-remaining"]) < int(first.headers["ratelimit-remaining"])
+
+def test_a_locked_bucket_is_waited_for_off_the_event_loop(tmp_path):
+    buckets = SharedTokenBuckets(str(tmp_path / "rate-limits"), slots=16)
+    buckets.take("key", 1)
+    with open(buckets.path) as other_worker:
+        fcntl.flock(other_worker, fcntl.LOCK_EX)
+        with pytest.raises(BlockingIOError):
+            buckets.take("key", 1, blocking=False)
+        threading.Timer(0.05, fcntl.flock, (other_worker, fcntl.LOCK_UN)).start()
+        assert asyncio.run(buckets.take_async("key", 1)).allowed
+
+def test_events_created_at_the_same_time_are_not_lost(client, headers, store):
+    earlier = tracking_event(created - timedelta(hours=1), "first")
+    store.add(shipment("S1", [earlier, tracking_event(created, "second")]))
+    polled = client.get("/shipments/S1/track", headers=headers)
+    cursor = {"since": polled.headers["x-last-updated"], "since_sequence": polled.headers["x-last-sequence"]}
+
+    store.add(shipment("S1", [earlier, tracking_event(created, "second"), tracking_event(created, "third")]))
+    response = client.get("/shipments/S1/track", params=cursor, headers=headers)
+    assert response.status_code == 200
+    assert [event["eta"] for event in response.json()["tracking_data"]["events"]] == ["third"]
+
+    batch = client.post("/track", params=cursor, json={"ids": ["S1"]}, headers=headers)
+    assert [event["eta"] for event in batch.json()[0]["tracking_data"]["events"]] == ["third"]
+
+    cursor["since_sequence"] = response.headers["x-last-sequence"]
+    assert client.get("/shipments/S1/track", params=cursor, headers=headers).status_code == 204
+
+def test_if_modified_since_only_returns_the_events_created_after_it(client, headers, store):
+    store.add(shipment("S1", [tracking_event(created - timedelta(hours=hours), str(hours)) for hours in (2, 1, 0)]))
+    if_modified_since = {**headers, "if-modified-since": format_datetime(created - timedelta(minutes=90), usegmt=True)}
+
+    response = client.get("/shipments/S1/track", headers=if_modified_since)
+    assert [event["eta"] for event in response.json()["tracking_data"]["events"]] == ["1", "0"]
+    batch = client.post("/track", json={"ids": ["S1"]}, headers=if_modified_since)
+    assert [event["eta"] for event in batch.json()[0]["tracking_data"]["events"]] == ["1", "0"]
+
+    # The Last-Modified of the previous response
+    last_modified = {**headers, "if-modified-since": response.headers["last-modified"]}
+    assert client.get("/shipments/S1/track", headers=last_modified).status_code == 304
+    assert client.post("/track", json={"ids": ["S1"]}, headers=last_modified).status_code == 304
+
+def test_carrier_tracking_id_lookups_and_the_stream_do_not_overlap(client, headers, store):
+    store.add(shipment("S1", [tracking_event(created)], carrier_tracking_id="stream"))
+    assert client.get("/track/carrier/stream", headers=headers).json()["uuid_ref"] == "ref-S1"
+    assert client.post("/track/stream", json={"ids": ["S1"]}, headers=headers).status_code == 200
+    assert client.get("/track/stream", headers=headers).status_code == 405
+
+def test_carrier_tracking_ids_are_followed_through_tracking_updates(client, headers, store, updates):
+    store.add(shipment("S1", [tracking_event(created)], carrier_tracking_id="CT-1"))
+    assert client.post("/internal/tracking/events", json=[webhook_event("S1", "CT-1", "CT-2", created + timedelta(hours=1))], headers=updates).status_code == 204
+
+    for carrier_tracking_id in ("CT-1", "CT-2"):
+        response = client.get(f"/track/carrier/{carrier_tracking_id}", headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()["tracking_data"]["events"]) == 2
+    assert client.post("/track", json={"ids": ["CT-2"], "id_type": "carrier_tracking_id"}, headers=headers).json()[0]["id"] == "S1"
+    assert client.get("/track/carrier/CT-3", headers=headers).status_code == 404
+
+def test_tracking_updates_need_the_internal_token(client, headers, store, updates):
+    store.add(shipment("S1", [tracking_event(created)], carrier_tracking_id="CT-1"))
+    events = [webhook_event("S1", "CT-1", "CT-2")]
+    assert client.post("/internal/tracking/events", json=events).status_code == 404
+    assert client.post("/internal/tracking/events", content=b"{}", headers={"x-internal-token": "invalid", "content-type": "application/json"}).status_code == 404
+    # The public webhook only documents what customers receive
+    assert client.post("/webhook/tracking", json=events).status_code == 200
+    assert client.get("/track/carrier/CT-2", headers=headers).status_code == 404
+    assert len(store.shipments["S1"].timeline) == 1
+
+def test_events_only_rotate_tracking_ids_of_their_own_shipment(client, headers, store, updates):
+    store.add(shipment("VICTIM", [tracking_event(created)], carrier_tracking_id="CT-V"))
+    store.add(shipment("OTHER", [tracking_event(created)], carrier_tracking_id="CT-O"))
+    events = [webhook_event("OTHER", "CT-O", "CT-V"), webhook_event("OTHER", "CT-V", "CT-X")]
+    assert client.post("/internal/tracking/events", json=events, headers=updates).status_code == 204
+
+    assert client.get("/track/carrier/CT-V", headers=headers).json()["uuid_ref"] == store.shipments["VICTIM"].shipment.uuid_ref
+    assert client.post("/track", json={"ids": ["CT-V"], "id_type": "carrier_tracking_id"}, headers=headers).json()[0]["id"] == "VICTIM"
+    assert client.get("/track/carrier/CT-X", headers=headers).status_code == 404
+    assert not store.rotate_carrier_tracking_id("CT-O", "CT-V", ("OTHER", None))
+    assert store.carrier_tracking_ids["CT-V"] == ("VICTIM", None)
+
+def test_retried_tracking_updates_are_added_once(client, headers, store, updates):
+    store.add(shipment("S1", [tracking_event(created)], carrier_tracking_id="CT-1"))
+    events = [webhook_event("S1", "CT-1", "CT-2", created + timedelta(hours=1))]
+    for _ in range(2):
+        assert client.post("/internal/tracking/events", json=events, headers=updates).status_code == 204
+    assert len(client.get("/shipments/S1/track", headers=headers).json()["tracking_data"]["events"]) == 2
@@ -0,0 +1,15 @@
+import os
+import statistics
+
+from benchmarks.cold_start import run_cold_start
+
+# Median milliseconds from starting to import app.main to its first response, in a fresh interpreter
+budget_ms = float(os.getenv("COLD_START_BUDGET_MS", 1500))
+runs = 3
+
+def test_cold_start_is_within_budget_and_the_guide_page_stack_stays_lazy():
+    results = [run_cold_start() for _ in range(runs)]
+    responded_ms = statistics.median(result[1] for result in results) * 1000
+    assert responded_ms <= budget_ms, f"cold start {responded_ms:.0f}ms is over the {budget_ms:.0f}ms budget, see python -m benchmarks.cold_start"
+    eager = {module for result in results for module in result[3].split(",") if module}
+    assert not eager, f"{', '.join(sorted(eager))} loaded before the first guide page, keep them lazy in markdown_pages.create_markdown_pipeline"
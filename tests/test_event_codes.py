@@ -0,0 +1,96 @@
+import json
+import os
+
+from app import event_codes as event_codes_module
+from app.event_codes import EventCodeCatalogue, stream_csv, stream_json, stream_ndjson
+
+header = "milestone,code,sub_code,detailed_explanation\n"
+
+def write_catalogue(tmp_path, rows: str) -> dict[str, str]:
+    path = tmp_path / "events.csv"
+    path.write_text(header + rows, encoding="utf-8")
+    return {"events": str(path)}
+
+def touch(path: str, mtime_ns: int):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_a_repeated_event_code_keeps_its_first_row(tmp_path):
+    files = write_catalogue(tmp_path, "delivery,attempt,left_notice,First\ndelivery,attempt,,Attempted\ndelivery,attempt,left_notice,Second\n")
+    view = EventCodeCatalogue("test", files, {}).export_view("events")
+    assert [event["description"] for event in view.events] == ["First", "Attempted"]
+    assert [row[3] for row in view.rows] == ["First", "Attempted"]
+    assert view.by_event[("delivery", "attempt", "left_notice")]["description"] == "First"
+    assert view.tree["delivery"]["attempt"]["left_notice"] == "First"
+
+def test_a_catalogue_that_cannot_be_reloaded_keeps_serving_the_previous_one(tmp_path):
+    files = write_catalogue(tmp_path, "delivery,attempt,left_notice,First\n")
+    catalogue = EventCodeCatalogue("test", files, {})
+    catalogue.check_interval = 0
+    view, revision = catalogue.export_view("events"), catalogue.revision
+
+    (tmp_path / "events.csv").write_text("milestone,code\ndelivery,attempt\n", encoding="utf-8")
+    touch(files["events"], 1_000_000_000)
+    assert catalogue.export_view("events") is view
+    assert catalogue.revision == revision
+
+    (tmp_path / "events.csv").write_text(header + "delivery,attempt,left_notice,Fixed\n", encoding="utf-8")
+    touch(files["events"], 2_000_000_000)
+    assert catalogue.export_view("events").events[0]["description"] == "Fixed"
+    assert catalogue.revision != revision
+
+def test_event_codes_are_indexed_by_milestone_code_and_sub_code(tmp_path):
+    files = write_catalogue(tmp_path, "delivery,delivered,,Delivered\ndelivery,delivered,neighbour,Left with a neighbour\nexception,damaged,,Damaged\n")
+    view = EventCodeCatalogue("test", files, {}).file_view("events")
+    assert [event["sub_code"] for event in view.by_code["delivered"]] == ["No Sub Event", "neighbour"]
+    assert [event["code"] for event in view.by_milestone["exception"]] == ["damaged"]
+    assert view.by_sub_code[("delivered", "neighbour")][0]["description"] == "Left with a neighbour"
+
+def test_combined_views_export_the_rows_of_every_part(tmp_path):
+    (tmp_path / "extra.csv").write_text(header + "exception,damaged,,Damaged\n", encoding="utf-8")
+    files = {**write_catalogue(tmp_path, "delivery,delivered,,Delivered\n"), "extra": str(tmp_path / "extra.csv")}
+    catalogue = EventCodeCatalogue("test", files, {"combined": ["events", "extra"]})
+    assert [event["code"] for event in catalogue.export_view("combined").events] == ["delivered", "damaged"]
+    assert [event["code"] for event in catalogue.export_view("events").events] == ["delivered"]
+
+def test_a_catalogue_is_reloaded_when_a_file_changes(tmp_path):
+    files = write_catalogue(tmp_path, "delivery,delivered,,Delivered\n")
+    catalogue = EventCodeCatalogue("test", files, {})
+    catalogue.check_interval = 0
+    catalogue.file_view("events")
+    revision = catalogue.revision
+
+    (tmp_path / "events.csv").write_text(header + "delivery,delivered,,Delivered to the door\n", encoding="utf-8")
+    touch(files["events"], 1_000_000_000)
+    assert catalogue.file_view("events").events[0]["description"] == "Delivered to the door"
+    assert catalogue.revision != revision
+
+def test_exports_are_streamed_in_bounded_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_codes_module, "chunk_size", 64)
+    rows = "".join(f"delivery,delivered,sub_{index},Delivered {index}\n" for index in range(20))
+    view = EventCodeCatalogue("test", write_catalogue(tmp_path, rows), {}).export_view("events")
+
+    chunks = list(stream_csv(view))
+    assert len(chunks) > 1
+    assert all(len(chunk) < 64 * 2 for chunk in chunks)
+    assert b"".join(chunks).decode().replace("\r\n", "\n") == header + rows
+    assert json.loads(b"".join(stream_json(view))) == view.events
+    assert [json.loads(line) for line in b"".join(stream_ndjson(view)).splitlines()] == view.events
+
+def test_the_json_export_is_also_served_as_ndjson(client):
+    events = client.get("/json/outbound").json()
+    response = client.get("/json/outbound", headers={"accept": "application/x-ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == events
+    assert client.get("/csv/outbound").text.count("\n") == len(events) + 1
+
+def test_the_catalogue_diff_maps_v1_codes_to_v2(client):
+    response = client.get("/event-codes/diff/v1/v2")
+    diff = response.json()
+    mapping = {tuple(item["from_code"].values()): item for item in diff["mapping"]}
+    assert mapping[("start", "start", "gluey_test")]["to_code"] == {"milestone": "order", "code": "created", "sub_code": "gluey_test"}
+    assert mapping[("start", "start", "gluey_test")]["match"] == "renamed"
+    assert "order" in diff["added_milestones"] and "start" in diff["removed_milestones"]
+
+    # The document is built once per catalogue revision
+    assert client.get("/event-codes/diff/v1/v2").headers["etag"] == response.headers["etag"]
+    assert client.get("/event-codes/diff/v1/v2", headers={"if-none-match": response.headers["etag"]}).status_code == 304
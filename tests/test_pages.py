@@ -0,0 +1,69 @@
+import hashlib
+
+import brotli
+import pytest
+from starlette.requests import Request
+
+from app.api.v1.templates.MermaidExtension import mermaid_js_src, mermaid_js_url, vendor_mermaid_js
+from app.page_cache import CachedPage, PageCache
+
+class CountingTemplates:
+    """Stands in for Jinja2Templates, rendering the context's page and counting the renders."""
+
+    def __init__(self):
+        self.renders = 0
+
+    def get_template(self, name: str):
+        return self
+
+    def render(self, context: dict) -> str:
+        self.renders += 1
+        return f"<p>{context['page']}</p>"
+
+def request(accept_encoding: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+def test_pages_are_only_rendered_again_when_their_data_changes():
+    templates = CountingTemplates()
+    pages = PageCache(templates)
+    first = pages.get("/events", "events.html", {"page": "one"}, "revision-1")
+    assert pages.get("/events", "events.html", {"page": "one"}, "revision-1") is first
+    assert templates.renders == 1
+
+    assert pages.get("/events", "events.html", {"page": "two"}, "revision-2").variants["identity"] == b"<p>two</p>"
+    assert templates.renders == 2
+
+def test_cached_pages_are_served_in_the_encoding_the_client_accepts():
+    page = CachedPage(b"<p>page</p>" * 100)
+    response = page.response(request("gzip, br"))
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(response.body) == b"<p>page</p>" * 100
+    identity = page.response(request(""))
+    assert "content-encoding" not in identity.headers
+    assert identity.body == b"<p>page</p>" * 100
+    assert response.headers["etag"] != identity.headers["etag"]
+
+def test_cached_pages_are_revalidated_with_their_etag(client):
+    response = client.get("/webhook-retry", headers={"accept-encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert client.get("/webhook-retry", headers={"accept-encoding": "br", "if-none-match": response.headers["etag"]}).status_code == 304
+    assert client.get("/webhook-retry", headers={"accept-encoding": "gzip", "if-none-match": response.headers["etag"]}).status_code == 200
+
+def test_mermaid_js_is_loaded_from_the_cdn_until_it_is_vendored(tmp_path):
+    path = tmp_path / "mermaid.min.js"
+    assert mermaid_js_src(str(path)) == mermaid_js_url
+    path.write_text("mermaid")
+    assert mermaid_js_src(str(path)) == "/static/mermaid.min.js"
+
+def test_vendored_mermaid_js_must_match_its_sha256(tmp_path):
+    download = tmp_path / "download.js"
+    download.write_bytes(b"mermaid")
+    path = tmp_path / "mermaid.min.js"
+    with pytest.raises(ValueError):
+        vendor_mermaid_js(str(path), download.as_uri(), None)
+    with pytest.raises(ValueError):
+        vendor_mermaid_js(str(path), download.as_uri(), hashlib.sha256(b"other").hexdigest())
+    assert not path.exists()
+
+    assert vendor_mermaid_js(str(path), download.as_uri(), hashlib.sha256(b"mermaid").hexdigest())
+    assert path.read_bytes() == b"mermaid"
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from app.api.v1.tracking.store import page_bounds
+from tests.payloads import created, parcel, parcel_shipment, shipment, tracking_event
+
+hour = timedelta(hours=1)
+
+# Three events created at the same time between two others, and the sequence each was stored with
+timeline = [(created - hour, 1), (created, 2), (created, 3), (created, 4), (created + hour, 5)]
+
+def test_a_page_that_would_split_events_created_at_the_same_time_ends_before_them():
+    low, start, high = page_bounds(timeline, None, None, 2)
+    assert (low, start, high) == (0, 4, 5)
+
+def test_events_created_at_the_same_time_that_fill_a_page_on_their_own_are_all_in_it():
+    low, start, high = page_bounds(timeline, None, created + hour, 2)
+    assert (low, start, high) == (0, 1, 4)
+
+def test_the_page_before_events_created_at_the_same_time_has_none_of_them():
+    assert page_bounds(timeline, None, created, 2) == (0, 0, 1)
+
+def test_a_since_cursor_between_events_created_at_the_same_time_keeps_the_ones_after_it():
+    assert page_bounds(timeline, (created, 2), None, None) == (2, 2, 5)
+    assert page_bounds(timeline, (created, 2), None, 1) == (2, 4, 5)
+    # Only the tied events are left, so the page takes all of them
+    assert page_bounds(timeline, (created, 2), created + hour, 1) == (2, 2, 4)
+
+def test_paging_with_next_before_returns_every_event_once(client, headers, store):
+    store.add(shipment("S1", [tracking_event(created - hour, "a"), *(tracking_event(created, eta) for eta in "bcd"), tracking_event(created + hour, "e")]))
+    pages = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/shipments/S1/track", params=params, headers=headers)
+        pages.append([event["eta"] for event in response.json()["tracking_data"]["events"]])
+        if "x-next-before" not in response.headers:
+            break
+        params["before"] = response.headers["x-next-before"]
+    assert pages == [["e"], ["b", "c", "d"], ["a"]]
+
+def test_limit_returns_the_latest_events(client, headers, store):
+    store.add(shipment("S1", [tracking_event(created + hour * hours, str(hours)) for hours in range(5)]))
+    response = client.get("/shipments/S1/track", params={"limit": 2}, headers=headers)
+    assert [event["eta"] for event in response.json()["tracking_data"]["events"]] == ["3", "4"]
+    assert response.headers["x-next-before"] == (created + hour * 3).isoformat().replace("+00:00", "Z")
+    assert "x-next-before" not in client.get("/shipments/S1/track", params={"limit": 5}, headers=headers).headers
+
+def test_parcels_are_tracked_without_their_sibling_parcels(client, headers, store):
+    store.add(parcel_shipment("S1", [parcel("P1", [tracking_event(created, "p1")], "CT-P1"), parcel("P2", [tracking_event(created, "p2")])]))
+
+    response = client.get("/shipments/S1/parcels/P1/track", headers=headers)
+    assert response.json()["id"] == "P1"
+    assert [event["eta"] for event in response.json()["tracking_data"]["events"]] == ["p1"]
+    assert client.get("/shipments/S2/parcels/P1/track", headers=headers).status_code == 404
+
+    batch = client.post("/parcels/track", json={"ids": ["CT-P1", "P2"], "id_type": "carrier_tracking_id"}, headers=headers).json()
+    assert [(item["id"], item["shipment_id"], item["parcel"]["id"]) for item in batch] == [("CT-P1", "S1", "P1")]
+    batch = client.post("/parcels/track", json={"ids": ["P2", "P1"]}, headers=headers).json()
+    assert [item["parcel"]["id"] for item in batch] == ["P2", "P1"]
+
+def test_a_parcel_that_is_removed_from_its_shipment_is_no_longer_tracked(client, headers, store):
+    store.add(parcel_shipment("S1", [parcel("P1", [tracking_event()]), parcel("P2", [tracking_event()])]))
+    store.add(parcel_shipment("S1", [parcel("P1", [tracking_event(), tracking_event(created + hour)])]))
+    assert client.get("/shipments/S1/parcels/P2/track", headers=headers).status_code == 404
+    assert len(client.get("/shipments/S1/parcels/P1/track", headers=headers).json()["tracking_data"]["events"]) == 2